@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .vocabulary import normalize_value
+from .utils import (
+    split_and_clean,
+    ADMISSION_MAX_INFLIGHT_COST,
+    ADMISSION_MAX_QUEUED_COST,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_RETRY_AFTER,
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Endpoints that score against the model; everything else bypasses admission.
+# /recommend/page only scores when a cursor has to be ranked deeper, and
+# acquires capacity itself then.
+SCORING_ROUTES = {("POST", "/recommend")}
+
+def estimate_cost(body: bytes) -> int:
+    """
+    Estimate the scoring cost of a recommendation request body.
+
+    Every criterion is a pass over all entities, so the cost is the number of
+    distinct criteria the request maps to (at least 1). Bodies that don't
+    parse cost 1 and are left to request validation.
+    """
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        return 1
+    if not isinstance(payload, dict):
+        return 1
+
+    # Repeated values are folded into one criterion before scoring
+    values = set()
+    for field in ("cooking_method", "cuisine_region"):
+        if isinstance(payload.get(field), str):
+            values.add((field, normalize_value(payload[field])))
+    for field in ("diet_types", "meal_type", "health_types"):
+        if isinstance(payload.get(field), list):
+            parts = [part for value in payload[field] if isinstance(value, str) for part in split_and_clean(value, ",")]
+            values.update((field, normalize_value(part)) for part in parts)
+    if isinstance(payload.get("ingredients"), list):
+        values.update(("ingredients", normalize_value(v)) for v in payload["ingredients"] if isinstance(v, str))
+    return max(sum(1 for _, value in values if value), 1)
+
+class AdmissionController:
+    """
+    Bounds the scoring work in flight and waiting for it.
+
+    Requests are admitted in arrival order while their cost fits into the
+    in-flight budget, wait in a FIFO queue bounded by total queued cost
+    otherwise, and are shed when the queue is full or they waited longer
+    than ``queue_timeout``. All methods run on the event loop thread.
+    """
+
+    def __init__(
+        self,
+        max_inflight_cost: int = ADMISSION_MAX_INFLIGHT_COST,
+        max_queued_cost: int = ADMISSION_MAX_QUEUED_COST,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        retry_after: int = ADMISSION_RETRY_AFTER,
+    ):
+        self.max_inflight_cost = max_inflight_cost
+        self.max_queued_cost = max_queued_cost
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.inflight_cost = 0
+        self.queued_cost = 0
+        self.admitted = 0
+        self.shed = 0
+        self._waiters: Deque[List[Any]] = deque()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_inflight_cost > 0
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "inflight_cost": self.inflight_cost,
+            "queued_cost": self.queued_cost,
+            "queued_requests": len(self._waiters),
+            "max_inflight_cost": self.max_inflight_cost,
+            "max_queued_cost": self.max_queued_cost,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+    async def acquire(self, cost: int) -> bool:
+        """
+        Wait until ``cost`` fits into the in-flight budget.
+
+        Returns:
+            False if the request should be shed
+        """
+        # A request larger than the whole budget runs alone rather than never
+        cost = min(cost, self.max_inflight_cost)
+        if not self._waiters and self.inflight_cost + cost <= self.max_inflight_cost:
+            self.inflight_cost += cost
+            self.admitted += 1
+            return True
+        if self.queued_cost + cost > self.max_queued_cost:
+            self.shed += 1
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [cost, future]
+        self._waiters.append(entry)
+        self.queued_cost += cost
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except BaseException as e:
+            # Timed out or the client went away; the slot may have been granted
+            # in the meantime (wait_for raises TimeoutError then too), so give it back
+            if future.done() and not future.cancelled():
+                self.release(cost)
+            else:
+                self._dequeue(entry)
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed += 1
+                return False
+            raise
+        self.admitted += 1
+        return True
+
+    def release(self, cost: int) -> None:
+        self.inflight_cost -= min(cost, self.max_inflight_cost)
+        self._wake()
+
+    def _dequeue(self, entry: List[Any]) -> None:
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            self.queued_cost -= entry[0]
+            self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.inflight_cost + self._waiters[0][0] <= self.max_inflight_cost:
+            cost, future = self._waiters.popleft()
+            self.queued_cost -= cost
+            if future.done():
+                continue
+            self.inflight_cost += cost
+            future.set_result(None)
+
+class AdmissionMiddleware:
+    """
+    Sheds scoring requests the controller doesn't admit with 503 and Retry-After.
+
+    Only ``SCORING_ROUTES`` pass through the controller. Cheap endpoints and
+    health checks never queue behind scoring work, and since admitted scoring
+    is bounded, the threads and event loop they need stay available.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not self.controller.enabled
+            or (scope["method"], scope["path"].rstrip("/")) not in SCORING_ROUTES
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        body, messages = await self._read_body(receive)
+        cost = estimate_cost(body)
+        if not await self.controller.acquire(cost):
+            logger.warning(
+                f"Shedding {scope['method']} {scope['path']} (cost {cost}, "
+                f"in flight {self.controller.inflight_cost}, queued {self.controller.queued_cost})"
+            )
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry later"},
+                status_code=503,
+                headers={"Retry-After": str(self.controller.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        async def replay() -> Message:
+            return messages.pop(0) if messages else await receive()
+
+        try:
+            await self.app(scope, replay, send)
+        finally:
+            self.controller.release(cost)
+
+    @staticmethod
+    async def _read_body(receive: Receive) -> Tuple[bytes, List[Message]]:
+        """Read the request body, keeping the messages to replay them to the app."""
+        messages, chunks = [], []
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks), messages
+
+# Shared controller of the app
+admission_controller = AdmissionController()
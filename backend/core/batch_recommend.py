@@ -0,0 +1,366 @@
+import argparse
+import json
+import logging
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from cachetools import LRUCache
+from pydantic import ValidationError
+
+from models.schemas import RecommendationRequest
+from .materialize import _raw_scores
+from .model_manager import model_manager, ModelHandle
+from .query_planner import plan_query
+from .recommender import (
+    map_user_input_to_criteria,
+    map_user_input_to_exclusions,
+    map_user_input_to_ranges,
+    _parse_recipe_id,
+)
+from .scoring_kernel import _normalize
+from .sharded_scoring import ShardedScorer
+from .vocabulary import UnknownCriteriaError
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _parquet_records(path: Path, batch_size: int, skip: int) -> Iterator[Any]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Reading Parquet input requires pyarrow")
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        if skip >= batch.num_rows:
+            skip -= batch.num_rows
+            continue
+        yield from batch.slice(skip).to_pylist()
+        skip = 0
+
+def _jsonl_records(path: Path, skip: int) -> Iterator[Any]:
+    with open(path) as f:
+        for number, line in enumerate(f):
+            if number < skip:
+                continue
+            try:
+                yield json.loads(line) if line.strip() else {}
+            except json.JSONDecodeError as e:
+                yield e
+
+def read_profiles(path: Path, chunk_size: int, skip: int = 0) -> Iterator[List[Tuple[int, Any]]]:
+    """
+    Stream (record number, profile) chunks from a JSONL or Parquet file.
+
+    The first ``skip`` records are passed over without being parsed. A JSONL
+    line that isn't valid JSON is yielded as its JSONDecodeError, so it ends
+    up as an error line of the output instead of stopping the run.
+    """
+    if path.suffix == ".parquet":
+        records = _parquet_records(path, chunk_size, skip)
+    else:
+        records = _jsonl_records(path, skip)
+
+    chunk: List[Tuple[int, Any]] = []
+    for number, record in enumerate(records, start=skip):
+        chunk.append((number, record))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class _BatchScorer:
+    """
+    Ranks profiles of one chunk after another, sharing criterion scores.
+
+    Every distinct criterion is scored against all entities once and kept as
+    a normalized recipe score vector in an LRU cache, so profiles repeating
+    popular criteria cost a weighted sum of cached vectors plus top-k.
+    """
+
+    def __init__(self, handle: ModelHandle, cache_mb: int, id_field: str, top_k: Optional[int]):
+        self.handle = handle
+        self.scorer = handle.scorer._local if isinstance(handle.scorer, ShardedScorer) else handle.scorer
+        self.recipe_ids = handle.attributes.recipe_ids
+        self.id_field = id_field
+        self.top_k = top_k
+        row_bytes = max(len(self.recipe_ids) * 4, 1)
+        self._rows: LRUCache = LRUCache(maxsize=max(cache_mb * 1024 * 1024 // row_bytes, 1))
+        self.hits = 0
+        self.misses = 0
+
+    def _criterion_rows(self, criteria: List[Tuple[str, str]]) -> Dict[Tuple[str, str], torch.Tensor]:
+        """
+        Normalized recipe score vectors of a chunk's criteria.
+
+        Cached vectors are reused; the others are taken from a dense
+        materialized matrix if there is one, or scored in batches.
+        """
+        rows: Dict[Tuple[str, str], torch.Tensor] = {}
+        criteria = list(dict.fromkeys(criteria))
+        for criterion in criteria:
+            row = self._rows.get(criterion)
+            if row is not None:
+                rows[criterion] = row
+                self.hits += 1
+            else:
+                self.misses += 1
+        missing = [c for c in criteria if c not in rows]
+
+        materialized = self.handle.materialized
+        if materialized is not None and materialized.format == "dense":
+            for criterion, row in zip(missing, materialized.rows([(t, r, 1.0) for t, r in missing]) or []):
+                rows[criterion] = torch.from_numpy(np.asarray(materialized.scores[row], dtype=np.float32))
+            missing = [c for c in missing if c not in rows]
+
+        labels = self.handle.labels
+        for start in range(0, len(missing), 64):
+            batch = missing[start:start + 64]
+            relation_ids = [labels.relation_to_id[relation] for _, relation in batch]
+            tail_ids = [labels.entity_to_id[tail] for tail, _ in batch]
+            with torch.no_grad():
+                raw = _raw_scores(self.handle.model, self.scorer, relation_ids, tail_ids)
+                low = raw.amin(dim=1)
+                normalized = _normalize(raw, low, raw.amax(dim=1) - low)[:, self.recipe_ids]
+            for criterion, row in zip(batch, normalized):
+                rows[criterion] = row.clone()
+
+        for criterion in missing:
+            self._rows[criterion] = rows[criterion]
+        return rows
+
+    def _map(self, profile: Dict[str, Any]) -> Tuple[List[Tuple[str, str, float]], List[Tuple[str, str]], List[Tuple], int]:
+        request = RecommendationRequest(**{k: v for k, v in profile.items() if k != self.id_field})
+        vocabulary = self.handle.vocabulary
+        criteria = map_user_input_to_criteria(
+            cooking_method=request.cooking_method,
+            diet_types=request.diet_types,
+            meal_type=request.meal_type,
+            health_types=request.health_types,
+            cuisine_region=request.cuisine_region,
+            ingredients=request.ingredients,
+            weights=request.weights,
+            vocabulary=vocabulary,
+        )
+        exclusions = map_user_input_to_exclusions(
+            ingredients=request.exclude_ingredients,
+            diet_types=request.exclude_diet_types,
+            cuisine_regions=request.exclude_cuisine_regions,
+            vocabulary=vocabulary,
+        )
+        ranges = map_user_input_to_ranges(request.nutrition, self.handle.nutrition)
+        criteria = plan_query(criteria, self.handle).criteria
+        return criteria, exclusions, ranges, self.top_k or request.top_k
+
+    def score_chunk(self, chunk: List[Tuple[int, Any]]) -> List[str]:
+        """Rank a chunk of profiles; returns one JSON output line per profile."""
+        mapped = []
+        for number, profile in chunk:
+            if isinstance(profile, json.JSONDecodeError):
+                mapped.append((number, None, None, None, None, f"Invalid JSON: {str(profile)}"))
+                continue
+            if not isinstance(profile, dict):
+                mapped.append((number, None, None, None, None, "Profile must be a JSON object"))
+                continue
+            profile_id = profile.get(self.id_field, number)
+            try:
+                mapped.append((profile_id, *self._map(profile), None))
+            except (ValidationError, UnknownCriteriaError, TypeError) as e:
+                mapped.append((profile_id, None, None, None, None, str(e)))
+
+        # Each distinct criterion of the chunk is scored at most once
+        chunk_rows = self._criterion_rows(
+            [(tail, relation) for _, c, _, _, _, _ in mapped if c for tail, relation, _ in c]
+        )
+
+        labels = self.handle.labels.entity_id_to_label
+        lines = []
+        for profile_id, criteria, exclusions, ranges, top_k, error in mapped:
+            if error is not None:
+                lines.append(json.dumps({"id": profile_id, "error": error}))
+                continue
+            if not criteria:
+                lines.append(json.dumps({"id": profile_id, "error": "At least one search criterion must be provided"}))
+                continue
+
+            rows = torch.stack([chunk_rows[(tail, relation)] for tail, relation, _ in criteria])
+            scores = torch.mv(rows.t(), torch.as_tensor([w for _, _, w in criteria], dtype=torch.float32))
+            available = len(scores)
+            excluded = self.handle.attributes.mask(exclusions) if exclusions else None
+            if ranges:
+                excluded = self.handle.nutrition.excluded(ranges, excluded)
+            if excluded is not None:
+                scores = scores.masked_fill(torch.from_numpy(excluded), float("-inf"))
+                available -= int(excluded.sum())
+            top = torch.topk(scores, min(top_k, available))
+            recipe_ids = [_parse_recipe_id(labels[i]) for i in self.recipe_ids[top.indices].tolist()]
+            lines.append(json.dumps({"id": profile_id, "recipe_ids": recipe_ids, "scores": top.values.tolist()}))
+        return lines
+
+# Per-process scorer of pool workers
+_worker: Optional[_BatchScorer] = None
+
+def _init_worker(cache_mb: int, id_field: str, top_k: Optional[int], threads: int, ready) -> None:
+    global _worker
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    torch.set_num_threads(threads)
+    _worker = _BatchScorer(model_manager.get_handle(), cache_mb, id_field, top_k)
+    ready.release()
+
+def _score_in_worker(chunk: List[Tuple[int, Any]]) -> Tuple[List[str], int, int]:
+    hits, misses = _worker.hits, _worker.misses
+    lines = _worker.score_chunk(chunk)
+    return lines, _worker.hits - hits, _worker.misses - misses
+
+def _write_checkpoint(path: Path, input_path: Path, records: int, output_bytes: int) -> None:
+    """Atomically record how far the output is complete."""
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"input": str(input_path), "records": records, "output_bytes": output_bytes}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def run_batch(
+    input_path: Path,
+    output_path: Path,
+    workers: int = 1,
+    chunk_size: int = 1000,
+    cache_mb: int = 512,
+    id_field: str = "id",
+    top_k: Optional[int] = None,
+    resume: bool = False,
+) -> Dict[str, float]:
+    """
+    Rank all profiles of the input file and stream the results to the output.
+
+    Chunks are written in input order; after each one a checkpoint records
+    the number of finished records and the output size, so a failed run can
+    continue with ``resume`` from the last complete chunk.
+
+    Returns:
+        Run statistics: throughput in profiles per second is measured from
+        when all workers have loaded the model, the time that took is
+        reported as ``startup_seconds``
+    """
+    checkpoint_path = output_path.with_name(output_path.name + ".checkpoint")
+    skip, output_bytes = 0, 0
+    if resume and checkpoint_path.exists():
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint["input"] != str(input_path):
+            raise SystemExit(f"Checkpoint {checkpoint_path} belongs to {checkpoint['input']}")
+        skip, output_bytes = checkpoint["records"], checkpoint["output_bytes"]
+        if not output_path.exists() or output_path.stat().st_size < output_bytes:
+            raise SystemExit(
+                f"Cannot resume: {output_path} is missing or shorter than the {output_bytes} bytes "
+                f"recorded in {checkpoint_path}; remove the checkpoint to start over"
+            )
+        logger.info(f"Resuming after {skip} records")
+
+    output = open(output_path, "r+b" if skip else "wb")
+    # Drop anything written after the last checkpoint
+    output.truncate(output_bytes)
+    output.seek(output_bytes)
+
+    pool = None
+    starting = time.perf_counter()
+    if workers > 1:
+        threads = max(1, torch.get_num_threads() // workers)
+        context = mp.get_context("spawn")
+        ready = context.Semaphore(0)
+        pool = context.Pool(
+            workers, initializer=_init_worker, initargs=(cache_mb, id_field, top_k, threads, ready)
+        )
+        # Wait until every worker has loaded the model
+        for _ in range(workers):
+            ready.acquire()
+    else:
+        local = _BatchScorer(model_manager.get_handle(), cache_mb, id_field, top_k)
+
+    records, hits, misses = skip, 0, 0
+    started = time.perf_counter()
+    last_report = started
+    pending: deque = deque()
+
+    def finish(lines: List[str], num_records: int) -> None:
+        nonlocal records
+        output.write("".join(line + "\n" for line in lines).encode())
+        output.flush()
+        records += num_records
+        _write_checkpoint(checkpoint_path, input_path, records, output.tell())
+
+    try:
+        for chunk in read_profiles(input_path, chunk_size, skip):
+            if pool is None:
+                before = (local.hits, local.misses)
+                finish(local.score_chunk(chunk), len(chunk))
+                hits += local.hits - before[0]
+                misses += local.misses - before[1]
+            else:
+                pending.append((pool.apply_async(_score_in_worker, (chunk,)), len(chunk)))
+                # Bound memory: at most two chunks per worker in flight
+                while len(pending) >= 2 * workers:
+                    result, num_records = pending.popleft()
+                    lines, chunk_hits, chunk_misses = result.get()
+                    hits, misses = hits + chunk_hits, misses + chunk_misses
+                    finish(lines, num_records)
+
+            if time.perf_counter() - last_report >= 10:
+                last_report = time.perf_counter()
+                rate = (records - skip) / (last_report - started)
+                logger.info(f"{records} profiles done ({rate:.1f}/s)")
+
+        while pending:
+            result, num_records = pending.popleft()
+            lines, chunk_hits, chunk_misses = result.get()
+            hits, misses = hits + chunk_hits, misses + chunk_misses
+            finish(lines, num_records)
+    finally:
+        output.close()
+        if pool is not None:
+            pool.terminate()
+
+    # The output is complete, nothing left to resume
+    checkpoint_path.unlink(missing_ok=True)
+    elapsed = time.perf_counter() - started
+    return {
+        "profiles": records - skip,
+        "seconds": elapsed,
+        "startup_seconds": started - starting,
+        "profiles_per_second": (records - skip) / elapsed if elapsed > 0 else 0.0,
+        "criterion_cache_hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+def main() -> None:
+    """Rank recipes for every profile of a JSONL/Parquet file of recommendation requests."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("input", type=Path, help="JSONL or .parquet file of RecommendationRequest profiles")
+    parser.add_argument("output", type=Path, help="JSONL file of {id, recipe_ids, scores} results")
+    parser.add_argument("--workers", type=int, default=1, help="Scoring processes")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Profiles per chunk and checkpoint")
+    parser.add_argument("--cache-mb", type=int, default=512, help="Per-process criterion score cache size")
+    parser.add_argument("--id-field", default="id", help="Profile field copied to the output (default: record number)")
+    parser.add_argument("--top-k", type=int, default=None, help="Override the top_k of every profile")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint")
+    args = parser.parse_args()
+
+    # Per-profile mapping logs would drown the progress reports
+    logging.getLogger("core.recommender").setLevel(logging.WARNING)
+    stats = run_batch(
+        args.input, args.output, args.workers, args.chunk_size, args.cache_mb, args.id_field, args.top_k, args.resume
+    )
+    print(f"profiles:       {stats['profiles']}")
+    print(f"startup:        {stats['startup_seconds']:.1f}s")
+    print(f"time:           {stats['seconds']:.1f}s")
+    print(f"throughput:     {stats['profiles_per_second']:.1f} profiles/s")
+    print(f"cache hit rate: {stats['criterion_cache_hit_rate']:.3f}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main()
@@ -6,6 +6,8 @@ from pathlib import Path
 from typing import Counter, List, Dict, Any, Optional
 from functools import lru_cache
 
+from .recipe_store import RecipeStore
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -30,12 +32,13 @@ def load_recipes_df() -> pd.DataFrame:
         logger.error(f"Failed to load recipes: {str(e)}")
         raise
 
-# Initialize recipes_df at module level
+# Initialize the compact recipe store at module level; the DataFrame it is
+# built from is not kept
 try:
-    recipes_df = load_recipes_df()
+    recipe_store = RecipeStore.from_csv(CSV_PATH)
 except Exception as e:
-    logger.error(f"Error initializing recipes_df: {str(e)}")
-    recipes_df = pd.DataFrame()  # Fallback empty DataFrame
+    logger.error(f"Error initializing recipe_store: {str(e)}")
+    recipe_store = RecipeStore(pd.DataFrame())  # Fallback empty store
 
 def get_unique_ingredients() -> List[str]:
     """
@@ -44,22 +47,18 @@ def get_unique_ingredients() -> List[str]:
     
     Ingredients are sorted first by frequency (descending) then alphabetically.
     """
-    if "BestUsdaIngredientName" not in recipes_df.columns:
-        logger.warning("'BestUsdaIngredientName' column not found in DataFrame.")
+    if "BestUsdaIngredientName" not in recipe_store.columns:
+        logger.warning("'BestUsdaIngredientName' column not found in recipe store.")
         return []
     
     logger.info("Retrieving ingredients along with their frequency.")
     
-    # Use list comprehension to get all ingredient names at once
-    ingredients = [
-        part.strip()
-        for ing_str in recipes_df["BestUsdaIngredientName"].dropna()
-        for part in str(ing_str).split(';')
-        if part.strip() and part.strip().lower() not in {"unknown", "nan"}
-    ]
-    
-    # Count ingredient frequencies
-    counter = Counter(ingredients)
+    # Split each distinct ingredient string once, weighted by the number of recipes using it
+    counter = Counter()
+    for ing_str, count in recipe_store.value_counts("BestUsdaIngredientName"):
+        for part in str(ing_str).split(';'):
+            if part.strip() and part.strip().lower() not in {"unknown", "nan"}:
+                counter[part.strip()] += count
     
     logger.info(f"{len(counter)} unique ingredients found.")
     
@@ -0,0 +1,221 @@
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from .quantization import ReducedPrecisionModel, _full_precision_scores
+from .scoring_kernel import CompiledScorer, _normalize
+from .serving_artifact import LabelIndex
+from .utils import MATERIALIZED_SCORES_DIR
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+SUPPORTED_FORMATS = ("dense", "sparse")
+
+def _raw_scores(model, scorer: Optional[CompiledScorer], relation_ids: List[int], tail_ids: List[int]) -> torch.Tensor:
+    """Raw head scores of all entities for a batch of criteria, shape (batch, num_entities)."""
+    if scorer is not None:
+        return scorer.score_heads(relation_ids, tail_ids, 0, len(scorer.entities))
+    if isinstance(model, ReducedPrecisionModel):
+        return torch.stack([model.score_h(r, t) for r, t in zip(relation_ids, tail_ids)])
+    return torch.stack([_full_precision_scores(model, r, t) for r, t in zip(relation_ids, tail_ids)])
+
+def materialize_scores(
+    model,
+    scorer: Optional[CompiledScorer],
+    labels: LabelIndex,
+    recipe_ids: torch.LongTensor,
+    directory: Path,
+    version: str,
+    dtype: str = "float32",
+    top_n: Optional[int] = None,
+    batch_size: int = 64,
+) -> Dict[str, object]:
+    """
+    Precompute the normalized score of every recipe for every criterion.
+
+    Scores are normalized over all entities exactly as in online scoring.
+    The dense format stores a (num_criteria, num_recipes) matrix; the sparse
+    format keeps only the ``top_n`` best recipes per criterion.
+
+    Returns:
+        The manifest written next to the matrix files
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    pairs = [(r, t) for r, t in labels.pairs.tolist()]
+    num_recipes = len(recipe_ids)
+    fmt = "dense" if top_n is None else "sparse"
+    width = num_recipes if top_n is None else min(top_n, num_recipes)
+
+    scores = np.lib.format.open_memmap(directory / "scores.npy", mode="w+", dtype=dtype, shape=(len(pairs), width))
+    positions = None
+    if fmt == "sparse":
+        positions = np.lib.format.open_memmap(directory / "positions.npy", mode="w+", dtype=np.int32, shape=(len(pairs), width))
+
+    started = time.perf_counter()
+    with torch.no_grad():
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            raw = _raw_scores(model, scorer, [r for r, _ in batch], [t for _, t in batch])
+            normalized = _normalize(raw, raw.amin(dim=1), raw.amax(dim=1) - raw.amin(dim=1))[:, recipe_ids]
+            if fmt == "dense":
+                scores[start:start + len(batch)] = normalized.numpy()
+            else:
+                top = torch.topk(normalized, width, dim=1)
+                scores[start:start + len(batch)] = top.values.numpy()
+                positions[start:start + len(batch)] = top.indices.numpy()
+            logger.info(f"Materialized {start + len(batch)}/{len(pairs)} criteria")
+
+    scores.flush()
+    np.save(directory / "recipe_ids.npy", recipe_ids.numpy())
+    if positions is not None:
+        positions.flush()
+
+    entity_labels = labels.entity_id_to_label
+    relation_labels = labels.relation_id_to_label
+    manifest = {
+        "version": version,
+        "format": fmt,
+        "dtype": dtype,
+        "top_n": top_n,
+        "num_recipes": num_recipes,
+        "criteria": [[relation_labels[r], entity_labels[t]] for r, t in pairs],
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    # Written last: a directory without manifest is an incomplete run
+    with open(directory / MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+class MaterializedScores:
+    """
+    Memory-mapped criterion x recipe score matrix of one model version.
+
+    Rows are addressed by (tail, relation) criterion and hold normalized
+    scores over recipe positions, so ranking a request is a weighted sum of
+    a few rows plus top-k with no model involved. With the sparse format,
+    recipes outside a criterion's stored top-n contribute 0 for it, which
+    makes deep rankings approximate.
+    """
+
+    def __init__(self, directory: Path):
+        with open(directory / MANIFEST_FILE) as f:
+            manifest = json.load(f)
+        self.version: str = manifest["version"]
+        self.format: str = manifest["format"]
+        self.num_recipes: int = manifest["num_recipes"]
+        self.recipe_ids = torch.from_numpy(np.load(directory / "recipe_ids.npy"))
+        self.scores = np.load(directory / "scores.npy", mmap_mode="r")
+        self.positions = np.load(directory / "positions.npy", mmap_mode="r") if self.format == "sparse" else None
+        self._rows: Dict[Tuple[str, str], int] = {
+            (tail, relation): row for row, (relation, tail) in enumerate(manifest["criteria"])
+        }
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def rows(self, criteria: List[Tuple[str, str, float]]) -> Optional[List[int]]:
+        """Matrix rows of the criteria, or None if any of them wasn't materialized."""
+        rows = [self._rows.get((tail, relation)) for tail, relation, _ in criteria]
+        return None if any(row is None for row in rows) else rows
+
+    def topk(
+        self,
+        rows: List[int],
+        weights: List[float],
+        k: int,
+        excluded: Optional[np.ndarray] = None,
+    ) -> Tuple[torch.LongTensor, torch.FloatTensor]:
+        """
+        Best-scoring recipes for the weighted rows.
+
+        Returns:
+            Recipe positions (indices into ``recipe_ids``) and their scores
+        """
+        weights = torch.as_tensor(weights, dtype=torch.float32)
+        if self.format == "dense" and excluded is not None and excluded.sum() * 4 > 3 * self.num_recipes:
+            # Selective filters: gather only the remaining recipe columns
+            allowed = np.flatnonzero(~excluded)
+            selected = torch.from_numpy(np.asarray(self.scores[np.ix_(rows, allowed)], dtype=np.float32))
+            top = torch.topk(torch.mv(selected.t(), weights), min(k, len(allowed)))
+            return torch.from_numpy(allowed)[top.indices], top.values
+
+        selected = torch.from_numpy(np.asarray(self.scores[rows], dtype=np.float32))
+        if self.format == "dense":
+            scores = torch.mv(selected.t(), weights)
+        else:
+            scores = torch.zeros(self.num_recipes)
+            positions = torch.from_numpy(np.asarray(self.positions[rows], dtype=np.int64))
+            scores.index_add_(0, positions.reshape(-1), (selected * weights.unsqueeze(1)).reshape(-1))
+
+        available = len(scores)
+        if excluded is not None:
+            scores = scores.masked_fill(torch.from_numpy(excluded), float("-inf"))
+            available -= int(excluded.sum())
+        top = torch.topk(scores, min(k, available))
+        return top.indices, top.values
+
+def load_materialized_scores(
+    version: str, recipe_ids: torch.LongTensor, root: Optional[str] = MATERIALIZED_SCORES_DIR
+) -> Optional[MaterializedScores]:
+    """Open the materialized matrix of a model version, or return None if there is no usable one."""
+    if not root:
+        return None
+    directory = Path(root) / version
+    if not (directory / MANIFEST_FILE).exists():
+        return None
+
+    try:
+        materialized = MaterializedScores(directory)
+    except Exception as e:
+        logger.warning(f"Ignoring materialized scores at {directory}: {str(e)}")
+        return None
+    if materialized.version != version or not torch.equal(materialized.recipe_ids, recipe_ids):
+        logger.warning(f"Ignoring materialized scores at {directory}: built for different artifacts")
+        return None
+
+    logger.info(
+        f"Using {materialized.format} materialized scores for {len(materialized)} criteria "
+        f"x {materialized.num_recipes} recipes from {directory}"
+    )
+    return materialized
+
+def main() -> None:
+    """Precompute the criterion x recipe score matrix of the served model version."""
+    from .model_manager import model_manager
+    from .sharded_scoring import ShardedScorer
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--output", default=MATERIALIZED_SCORES_DIR, help="Root directory of materialized versions")
+    parser.add_argument("--dtype", choices=("float32", "float16"), default="float32")
+    parser.add_argument("--top-n", type=int, default=None, help="Keep only the best N recipes per criterion (sparse)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Criteria scored per pass")
+    args = parser.parse_args()
+
+    handle = model_manager.get_handle()
+    scorer = handle.scorer._local if isinstance(handle.scorer, ShardedScorer) else handle.scorer
+    directory = Path(args.output) / handle.version
+    manifest = materialize_scores(
+        handle.model, scorer, handle.labels, handle.attributes.recipe_ids, directory,
+        handle.version, args.dtype, args.top_n, args.batch_size,
+    )
+
+    size = sum(path.stat().st_size for path in directory.iterdir())
+    print(f"version:    {manifest['version']}")
+    print(f"format:     {manifest['format']} ({manifest['dtype']})")
+    print(f"criteria:   {len(manifest['criteria'])}")
+    print(f"recipes:    {manifest['num_recipes']}")
+    print(f"size:       {size / (1024 * 1024):.2f}MB")
+    print(f"time:       {manifest['seconds']:.1f}s")
+    print(f"output:     {directory}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main()
@@ -1,26 +1,78 @@
 import torch
 import gc
 import logging
+import threading
+import time
 from pathlib import Path
-from typing import Tuple
+from typing import Any, Dict, Optional, Tuple, Union
 
 from pykeen.models import Model
-from pykeen.triples import TriplesFactory
 
-from .utils import load_kge_model, get_triples_factory
+from .data_loading import recipe_store
+from .materialize import MaterializedScores, load_materialized_scores
+from .nutrition_index import NutritionIndex
+from .quantization import ReducedPrecisionModel, quantize_model, recipe_entity_ids, validate_precision
+from .recipe_filters import RecipeAttributeIndex
+from .scoring_kernel import CompiledScorer, build_compiled_scorer
+from .serving_artifact import LabelIndex, load_serving_labels
+from .sharded_scoring import ShardedScorer, build_sharded_scorer
+from .vocabulary import VocabularyIndex
+from .utils import (
+    load_kge_model,
+    artifact_version,
+    SERVING_PRECISION,
+    PRECISION_MIN_OVERLAP,
+    COMPILED_SCORING,
+    SHARDED_SCORING_WORKERS,
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+class ModelHandle:
+    """
+    All serving artifacts of one loaded model version.
+
+    Requests take a reference to a handle once and use it throughout, so a
+    hot-swap never mixes artifacts of two versions within one request.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        model: Union[Model, ReducedPrecisionModel],
+        labels: LabelIndex,
+        scorer: Optional[Union[CompiledScorer, ShardedScorer]],
+        attributes: RecipeAttributeIndex,
+        vocabulary: VocabularyIndex,
+        materialized: Optional[MaterializedScores] = None,
+        nutrition: Optional[NutritionIndex] = None,
+    ):
+        self.version = version
+        self.model = model
+        self.labels = labels
+        self.scorer = scorer
+        self.attributes = attributes
+        self.vocabulary = vocabulary
+        self.materialized = materialized
+        self.nutrition = nutrition
+        self.loaded_at = time.time()
+
 class ModelManager:
     """
-    Singleton class for managing KGE model and triples factory.
+    Singleton class for managing KGE model and its label index.
     Ensures model is loaded only once and shared across requests.
+
+    New versions are loaded and warmed in the background and swapped in
+    atomically; in-flight requests finish on the handle they started with.
     """
     _instance = None
-    _model = None
-    _triples_factory = None
-    _is_loading = False
+
+    def __init__(self):
+        self._handle: Optional[ModelHandle] = None
+        self._load_lock = threading.Lock()
+        self._reload_thread: Optional[threading.Thread] = None
+        self._last_error: Optional[str] = None
 
     @classmethod
     def get_instance(cls):
@@ -28,50 +80,184 @@ class ModelManager:
             logger.info("Creating new ModelManager instance")
             cls._instance = ModelManager()
         return cls._instance
-    
-    def get_model_and_triples(self) -> Tuple[Model, TriplesFactory]:
+
+    def get_handle(self) -> ModelHandle:
+        """
+        Get the current model handle, loading the first version if needed.
+        Concurrent callers block on a lock until the initial load finishes.
+        """
+        handle = self._handle
+        if handle is not None:
+            return handle
+
+        with self._load_lock:
+            if self._handle is None:
+                self._handle = self._load_handle()
+            return self._handle
+
+    def get_model_and_labels(self) -> Tuple[Union[Model, ReducedPrecisionModel], LabelIndex]:
         """
-        Get the model and triples factory. If they're not loaded yet,
+        Get the model and its label index. If they're not loaded yet,
         load them. Thread-safe to avoid duplicate loading.
+
+        With a reduced serving precision configured, the returned model is a
+        ReducedPrecisionModel instead of the full-precision pykeen model.
+        """
+        handle = self.get_handle()
+        return handle.model, handle.labels
+
+    def get_scorer(self) -> Optional[Union[CompiledScorer, ShardedScorer]]:
+        """
+        Get the compiled scoring kernel for the loaded model, loading it first
+        if needed. None means the generic prediction path must be used.
+        """
+        return self.get_handle().scorer
+
+    @property
+    def version(self) -> str:
+        """Version of the loaded model and dataset, loading them first if needed."""
+        return self.get_handle().version
+
+    @property
+    def is_reloading(self) -> bool:
+        thread = self._reload_thread
+        return thread is not None and thread.is_alive()
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Start loading the model/dataset currently on disk in the background.
+
+        Args:
+            force: Reload even if the on-disk version matches the served one
+
+        Returns:
+            False if a reload is already in progress, True otherwise
         """
-        # Check if already loaded
-        if self._model is not None and self._triples_factory is not None:
-            return self._model, self._triples_factory
-        
-        # Prevent concurrent loading
-        if self._is_loading:
-            logger.info("Model is already being loaded by another thread, waiting...")
-            while self._is_loading:
-                pass  # Simple spin lock
-            return self._model, self._triples_factory
-        
+        with self._load_lock:
+            if self.is_reloading:
+                return False
+            self._reload_thread = threading.Thread(
+                target=self._reload, args=(force,), name="model-reload", daemon=True
+            )
+            self._reload_thread.start()
+            return True
+
+    def status(self) -> Dict[str, Any]:
+        """Describe the served version and the state of background reloads."""
+        handle = self._handle
+        return {
+            "version": handle.version if handle else None,
+            "loaded_at": handle.loaded_at if handle else None,
+            "model": type(handle.model).__name__ if handle else None,
+            "compiled_scoring": bool(handle and handle.scorer),
+            "scoring_workers": handle.scorer.num_workers if handle and isinstance(handle.scorer, ShardedScorer) else 0,
+            "materialized_scores": handle.materialized.format if handle and handle.materialized else None,
+            "reloading": self.is_reloading,
+            "last_error": self._last_error,
+        }
+
+    def _reload(self, force: bool) -> None:
+        """Load, warm up and swap in a new model version."""
+        try:
+            current = self._handle
+            if not force and current is not None and current.version == artifact_version():
+                logger.info(f"Model version {current.version} is already being served, skipping reload")
+                return
+
+            new_handle = self._load_handle()
+            # Single reference assignment: new requests see the new version,
+            # in-flight ones keep their reference to the old handle.
+            self._handle = new_handle
+            self._last_error = None
+            logger.info(
+                f"Swapped model version {current.version if current else None} -> {new_handle.version}"
+            )
+            # Old artifacts, including scoring workers, are freed once the last
+            # in-flight request drops its reference
+            del current
+        except Exception as e:
+            self._last_error = str(e)
+            logger.error(f"Error reloading model: {str(e)}", exc_info=True)
+        finally:
+            gc.collect()
+
+    def _load_handle(self) -> ModelHandle:
+        """Load and warm up all serving artifacts from disk."""
         try:
-            self._is_loading = True
             logger.info("Loading model and triples...")
-            
+
             # Memory cleanup before loading
             gc.collect()
             if torch.cuda.is_available():
                 torch.cuda.empty_cache()
-            
+
             # Load model and triples
             with torch.no_grad():  # Prevent memory leaks from gradients
-                self._model = load_kge_model().eval()
-                self._triples_factory = get_triples_factory()
-            
-            logger.info("Model and triples loaded successfully")
-            return self._model, self._triples_factory
-        
+                version = artifact_version()
+                model = load_kge_model().eval()
+                # Only compact label arrays are kept; the TriplesFactory never
+                # outlives this call
+                labels, attribute_triples = load_serving_labels()
+                if labels.num_entities != model.num_entities:
+                    raise ValueError(
+                        f"Label index has {labels.num_entities} entities, the model {model.num_entities}"
+                    )
+                serving_model = self._apply_serving_precision(model, labels)
+                del model
+                recipe_ids = recipe_entity_ids(labels)
+                scorer = None
+                if COMPILED_SCORING:
+                    scorer = build_compiled_scorer(serving_model, recipe_ids)
+                if scorer is not None and SHARDED_SCORING_WORKERS > 1:
+                    scorer = build_sharded_scorer(scorer, SHARDED_SCORING_WORKERS) or scorer
+                attributes = RecipeAttributeIndex(labels, attribute_triples, recipe_ids)
+                del attribute_triples
+                vocabulary = VocabularyIndex(labels)
+                nutrition = NutritionIndex(recipe_store, labels, recipe_ids)
+                materialized = load_materialized_scores(version, recipe_ids)
+
+            logger.info(f"Model and triples loaded successfully (version {version})")
+            return ModelHandle(
+                version, serving_model, labels, scorer, attributes, vocabulary, materialized, nutrition
+            )
+
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}", exc_info=True)
             raise
-        
+
         finally:
-            self._is_loading = False
             # Memory cleanup after loading
             gc.collect()
             if torch.cuda.is_available():
                 torch.cuda.empty_cache()
 
+    def _apply_serving_precision(
+        self, model: Model, labels: LabelIndex
+    ) -> Union[Model, ReducedPrecisionModel]:
+        """
+        Convert the model to the configured serving precision.
+
+        The reduced-precision model is validated against the full-precision one
+        on a small query sample; it is only used if the top-k overlap guardrail holds.
+        """
+        if SERVING_PRECISION == "float32":
+            return model
+
+        try:
+            reduced = quantize_model(model, SERVING_PRECISION)
+            report = validate_precision(model, reduced, labels, num_queries=20)
+        except Exception as e:
+            logger.warning(f"Falling back to float32 serving: {str(e)}")
+            return model
+
+        logger.info(f"{SERVING_PRECISION} validation: {report}")
+        if report["mean_overlap"] < PRECISION_MIN_OVERLAP:
+            logger.warning(
+                f"Falling back to float32 serving: mean top-k overlap {report['mean_overlap']:.3f} "
+                f"is below {PRECISION_MIN_OVERLAP}"
+            )
+            return model
+        return reduced
+
 # Create singleton instance at module load time
-model_manager = ModelManager.get_instance()
\ No newline at end of file
+model_manager = ModelManager.get_instance()
@@ -0,0 +1,117 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from .recipe_store import RecipeStore
+from .serving_artifact import LabelIndex
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Recipe table columns requests can filter on, as exposed by RecipeInfo
+NUTRITION_COLUMNS = (
+    "Calories",
+    "ProteinContent",
+    "CarbohydrateContent",
+    "FatContent",
+    "CholesterolContent",
+    "SodiumContent",
+    "SugarContent",
+    "FiberContent",
+)
+
+def _recipe_key(label: str) -> int:
+    """RecipeId of a recipe entity label, or -1 if it isn't numeric."""
+    try:
+        return int(label.split("recipe_", 1)[1])
+    except (IndexError, ValueError):
+        return -1
+
+class NutritionIndex:
+    """
+    Sorted per-column nutrition values of the ranked recipes.
+
+    For every column, recipe positions (indices into ``recipe_ids``) are kept
+    in ascending value order next to the sorted values, so a range resolves
+    to a contiguous slice by binary search. Recipes without a value for a
+    column never match a range on it.
+
+    The resulting candidates are applied as an exclusion mask. Only the dense
+    materialized matrix can restrict its work to them; model scoring has to
+    cover all entities for the min-max normalization.
+    """
+
+    def __init__(
+        self,
+        store: RecipeStore,
+        labels: LabelIndex,
+        recipe_ids: torch.LongTensor,
+        columns: Tuple[str, ...] = NUTRITION_COLUMNS,
+    ):
+        self.num_recipes = len(recipe_ids)
+        self._positions: Dict[str, np.ndarray] = {}
+        self._values: Dict[str, np.ndarray] = {}
+
+        entity_labels = labels.entity_id_to_label
+        keys = np.array([_recipe_key(entity_labels[i]) for i in recipe_ids.tolist()], dtype=np.int64)
+        for column in columns:
+            if column not in store.columns:
+                logger.warning(f"Recipe table has no {column} column, range filters on it are unavailable")
+                continue
+            try:
+                values = store.numeric_values(column, keys)
+            except ValueError:
+                # e.g. a stray non-numeric cell made the whole column strings
+                logger.warning(f"Recipe column {column} is not numeric, range filters on it are unavailable")
+                continue
+            # NaN sorts last and is cut off
+            order = np.argsort(values, kind="stable")[:int(np.count_nonzero(~np.isnan(values)))]
+            self._positions[column] = order.astype(np.int32)
+            self._values[column] = values[order]
+
+        logger.info(
+            f"Indexed {len(self._positions)} nutrition columns over {self.num_recipes} recipes "
+            f"in {self.nbytes / (1024 * 1024):.2f}MB"
+        )
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._positions)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self._positions.values()) + sum(a.nbytes for a in self._values.values())
+
+    def candidates(self, ranges: List[Tuple[str, Optional[float], Optional[float]]]) -> Optional[np.ndarray]:
+        """
+        Intersection of the recipes within all inclusive (column, min, max) ranges.
+
+        Returns:
+            Boolean array over recipe positions, or None if there are no ranges
+        """
+        result = None
+        for column, low, high in ranges:
+            values = self._values[column]
+            start = 0 if low is None else int(np.searchsorted(values, low, side="left"))
+            end = len(values) if high is None else int(np.searchsorted(values, high, side="right"))
+            inside = np.zeros(self.num_recipes, dtype=bool)
+            inside[self._positions[column][start:end]] = True
+            if result is None:
+                result = inside
+            else:
+                np.logical_and(result, inside, out=result)
+        return result
+
+    def excluded(
+        self,
+        ranges: List[Tuple[str, Optional[float], Optional[float]]],
+        excluded: Optional[np.ndarray] = None,
+    ) -> Optional[np.ndarray]:
+        """Fold the recipes outside the ranges into an exclusion mask over recipe positions."""
+        candidates = self.candidates(ranges)
+        if candidates is None:
+            return excluded
+        outside = ~candidates
+        return outside if excluded is None else np.logical_or(excluded, outside, out=outside)
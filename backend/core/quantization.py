@@ -0,0 +1,253 @@
+import argparse
+import logging
+import random
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from pykeen.models import ERModel, Model
+
+from .serving_artifact import LabelIndex
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Constants
+SUPPORTED_PRECISIONS = ("float32", "float16", "int8")
+DEFAULT_CHUNK_SIZE = 65536
+INT8_MAX = 127.0
+
+class QuantizedTable:
+    """
+    Embedding table stored in reduced precision.
+
+    Complex tables are stored as interleaved real/imaginary parts. int8 tables
+    use symmetric per-row quantization with one float32 scale per row.
+    """
+
+    def __init__(self, weights: torch.Tensor, precision: str = "float32"):
+        if precision not in SUPPORTED_PRECISIONS:
+            raise ValueError(f"Unsupported precision '{precision}', expected one of {SUPPORTED_PRECISIONS}")
+
+        weights = weights.detach()
+        self.precision = precision
+        self.is_complex = weights.is_complex()
+        if self.is_complex:
+            weights = torch.view_as_real(weights)
+        self.row_shape = tuple(weights.shape[1:])
+
+        rows = weights.reshape(weights.shape[0], -1).to(torch.float32)
+        self.scale: Optional[torch.Tensor] = None
+        if precision == "int8":
+            self.scale = rows.abs().amax(dim=1).clamp_min(1e-12) / INT8_MAX
+            self.data = torch.round(rows / self.scale.unsqueeze(1)).to(torch.int8)
+        elif precision == "float16":
+            self.data = rows.to(torch.float16)
+        else:
+            self.data = rows
+        self.data = self.data.contiguous()
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the table, including int8 row scales."""
+        size = self.data.element_size() * self.data.nelement()
+        if self.scale is not None:
+            size += self.scale.element_size() * self.scale.nelement()
+        return size
+
+    def _restore(self, rows: torch.Tensor, scale: Optional[torch.Tensor]) -> torch.Tensor:
+        """Convert stored rows back to float32 (or complex64) in the original shape."""
+        rows = rows.to(torch.float32)
+        if scale is not None:
+            rows = rows * scale.unsqueeze(1)
+        rows = rows.reshape(rows.shape[0], *self.row_shape)
+        if self.is_complex:
+            rows = torch.view_as_complex(rows.contiguous())
+        return rows
+
+    def dequantize(self, start: int = 0, end: Optional[int] = None) -> torch.Tensor:
+        """Dequantize a contiguous block of rows."""
+        scale = self.scale[start:end] if self.scale is not None else None
+        return self._restore(self.data[start:end], scale)
+
+    def gather(self, indices: torch.LongTensor) -> torch.Tensor:
+        """Dequantize the rows at the given indices."""
+        scale = self.scale[indices] if self.scale is not None else None
+        return self._restore(self.data[indices], scale)
+
+class ReducedPrecisionModel:
+    """
+    Serving wrapper that scores candidate heads directly on reduced-precision
+    entity/relation tables using the interaction function of the trained model.
+
+    Only models with a single entity and a single relation representation are
+    supported; the full-precision parameters are not kept.
+    """
+
+    def __init__(self, model: Model, precision: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if not isinstance(model, ERModel):
+            raise ValueError(f"Reduced-precision serving is not supported for {model.__class__.__name__}")
+        if len(model.entity_representations) != 1 or len(model.relation_representations) != 1:
+            raise ValueError(
+                f"Reduced-precision serving requires a single entity and relation representation, "
+                f"{model.__class__.__name__} has {len(model.entity_representations)} and "
+                f"{len(model.relation_representations)}"
+            )
+        if model.use_inverse_triples:
+            raise ValueError("Reduced-precision serving does not support models trained with inverse triples")
+
+        with torch.no_grad():
+            self.entities = QuantizedTable(model.entity_representations[0](indices=None), precision)
+            self.relations = QuantizedTable(model.relation_representations[0](indices=None), precision)
+
+        self.precision = precision
+        self.chunk_size = chunk_size
+        self.interaction = model.interaction.eval()
+        self.predict_with_sigmoid = model.predict_with_sigmoid
+        self.model_name = model.__class__.__name__
+        self.num_entities = len(self.entities)
+        self.num_relations = len(self.relations)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the reduced-precision embedding tables."""
+        return self.entities.nbytes + self.relations.nbytes
+
+    def score_h(self, relation_id: int, tail_id: int) -> torch.FloatTensor:
+        """
+        Score every entity as head for a single (relation, tail) pair.
+
+        The entity table is dequantized in chunks, so the transient float32
+        copy never exceeds ``chunk_size`` rows.
+
+        Returns:
+            Tensor of shape (num_entities,) with the same semantics as ``Model.predict_h``
+        """
+        with torch.no_grad():
+            r = self.relations.gather(torch.as_tensor([relation_id])).unsqueeze(0)
+            t = self.entities.gather(torch.as_tensor([tail_id])).unsqueeze(0)
+            scores = [
+                self.interaction(h=self.entities.dequantize(start, start + self.chunk_size).unsqueeze(0), r=r, t=t)
+                for start in range(0, self.num_entities, self.chunk_size)
+            ]
+            scores = torch.cat(scores, dim=-1).reshape(-1)
+            if self.predict_with_sigmoid:
+                scores = torch.sigmoid(scores)
+        return scores
+
+def quantize_model(model: Model, precision: str) -> ReducedPrecisionModel:
+    """Build a reduced-precision serving model from a trained KGE model."""
+    logger.info(f"Quantizing {model.__class__.__name__} embeddings to {precision}")
+    reduced = ReducedPrecisionModel(model, precision)
+    logger.info(f"Reduced-precision embeddings use {reduced.nbytes / (1024 * 1024):.2f}MB")
+    return reduced
+
+def _full_precision_scores(model: Model, relation_id: int, tail_id: int) -> torch.FloatTensor:
+    """Reference scores from the generic pykeen prediction path."""
+    with torch.no_grad():
+        return model.predict_h(torch.as_tensor([[relation_id, tail_id]])).reshape(-1)
+
+def _min_max(scores: torch.Tensor) -> torch.Tensor:
+    """Min-max normalize a score vector (constant vectors map to zero)."""
+    low, high = scores.min(), scores.max()
+    if high <= low:
+        return torch.zeros_like(scores)
+    return (scores - low) / (high - low)
+
+def _aggregate(
+    score_fn, query: List[Tuple[int, int, float]], recipe_ids: torch.LongTensor
+) -> torch.FloatTensor:
+    """Weighted sum of normalized per-criterion scores, restricted to recipe entities."""
+    total = None
+    for relation_id, tail_id, weight in query:
+        weighted = _min_max(score_fn(relation_id, tail_id)) * weight
+        total = weighted if total is None else total + weighted
+    return total[recipe_ids]
+
+def sample_queries(
+    labels: LabelIndex, num_queries: int, max_criteria: int = 4, seed: int = 0
+) -> List[List[Tuple[int, int, float]]]:
+    """Sample multi-criterion queries from (relation, tail) pairs present in the graph."""
+    rng = random.Random(seed)
+    pairs = [(r, t) for r, t in labels.pairs.tolist()]
+    return [
+        [(r, t, rng.choice([0.5, 1.0, 2.0, 3.0])) for r, t in rng.sample(pairs, rng.randint(1, min(max_criteria, len(pairs))))]
+        for _ in range(num_queries)
+    ]
+
+def recipe_entity_ids(labels: LabelIndex) -> torch.LongTensor:
+    """Ids of all recipe entities, in id order."""
+    return torch.as_tensor([
+        idx for idx, label in enumerate(labels.entity_id_to_label) if label.startswith("recipe_")
+    ])
+
+def validate_precision(
+    model: Model,
+    reduced: ReducedPrecisionModel,
+    labels: LabelIndex,
+    num_queries: int = 100,
+    top_k: int = 10,
+    seed: int = 0,
+) -> Dict[str, float]:
+    """
+    Compare a reduced-precision model against full precision on sampled queries.
+
+    Returns:
+        Mean/min top-k overlap of the recipe rankings and mean/max absolute
+        error of the aggregated normalized scores
+    """
+    recipe_ids = recipe_entity_ids(labels)
+    k = min(top_k, len(recipe_ids))
+    overlaps, mean_errors, max_errors = [], [], []
+    for query in sample_queries(labels, num_queries, seed=seed):
+        reference = _aggregate(lambda r, t: _full_precision_scores(model, r, t), query, recipe_ids)
+        candidate = _aggregate(reduced.score_h, query, recipe_ids)
+        ref_top = set(torch.topk(reference, k).indices.tolist())
+        cand_top = set(torch.topk(candidate, k).indices.tolist())
+        overlaps.append(len(ref_top & cand_top) / k)
+        error = (reference - candidate).abs()
+        mean_errors.append(error.mean().item())
+        max_errors.append(error.max().item())
+
+    return {
+        "queries": float(len(overlaps)),
+        "top_k": float(k),
+        "mean_overlap": sum(overlaps) / len(overlaps),
+        "min_overlap": min(overlaps),
+        "mean_abs_error": sum(mean_errors) / len(mean_errors),
+        "max_abs_error": max(max_errors),
+    }
+
+def main() -> None:
+    """Validate reduced-precision serving against the full-precision model."""
+    from .serving_artifact import load_serving_labels
+    from .utils import load_kge_model
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--precision", choices=SUPPORTED_PRECISIONS[1:], default="int8")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-overlap", type=float, default=0.9, help="Fail if mean top-k overlap is lower")
+    args = parser.parse_args()
+
+    model = load_kge_model().eval()
+    labels, _ = load_serving_labels()
+    reduced = quantize_model(model, args.precision)
+    report = validate_precision(model, reduced, labels, args.queries, args.top_k, args.seed)
+
+    full_bytes = sum(p.element_size() * p.nelement() for p in model.parameters())
+    print(f"model:            {model.__class__.__name__}")
+    print(f"precision:        {args.precision}")
+    print(f"embedding memory: {full_bytes / (1024 * 1024):.2f}MB -> {reduced.nbytes / (1024 * 1024):.2f}MB")
+    for key, value in report.items():
+        print(f"{key + ':':<18}{value:.6g}")
+
+    if report["mean_overlap"] < args.min_overlap:
+        raise SystemExit(f"Mean top-{args.top_k} overlap {report['mean_overlap']:.3f} is below {args.min_overlap}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main()
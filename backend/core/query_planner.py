@@ -0,0 +1,110 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from .model_manager import ModelHandle
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Criteria listed in the X-Query-Plan header at most
+EXPLAIN_MAX_CRITERIA = 20
+
+class QueryPlan:
+    """
+    Criteria of a request as they will be scored.
+
+    Criteria naming the same (tail, relation) are folded into one with the
+    summed weight, which ranks exactly like scoring each copy, and criteria
+    with a zero weight are dropped since they can't change the ranking.
+    Criteria served from a materialized matrix come first.
+    """
+
+    def __init__(
+        self,
+        criteria: List[Tuple[str, str, float]],
+        sources: List[int],
+        cached: List[bool],
+        dropped: List[Tuple[str, str]],
+        num_input: int,
+        path: str,
+    ):
+        self.criteria = criteria
+        self.sources = sources
+        self.cached = cached
+        self.dropped = dropped
+        self.num_input = num_input
+        self.path = path
+
+    def __len__(self) -> int:
+        return len(self.criteria)
+
+    def explain(self, max_criteria: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Describe the plan for debugging.
+
+        With ``max_criteria``, at most that many planned and dropped criteria
+        are listed in total and ``truncated`` counts the omitted ones.
+        """
+        planned = [
+            {"tail": tail, "relation": relation, "weight": weight, "merged": sources, "materialized": cached}
+            for (tail, relation, weight), sources, cached in zip(self.criteria, self.sources, self.cached)
+        ]
+        dropped = [{"tail": tail, "relation": relation} for tail, relation in self.dropped]
+        truncated = 0
+        if max_criteria is not None:
+            truncated = max(len(planned) + len(dropped) - max_criteria, 0)
+            planned = planned[:max_criteria]
+            dropped = dropped[:max_criteria - len(planned)]
+        return {
+            "path": self.path,
+            "input_criteria": self.num_input,
+            "planned_criteria": len(self.criteria),
+            "criteria": planned,
+            "dropped": dropped,
+            "truncated": truncated,
+        }
+
+def plan_query(
+    criteria: List[Tuple[str, str, float]],
+    handle: Optional[ModelHandle] = None,
+) -> QueryPlan:
+    """
+    Canonicalize mapped criteria before scoring.
+
+    Args:
+        criteria: List of (tail_entity, relation, weight) triples, possibly repeating
+        handle: Model version the plan is for; without one, nothing counts as materialized
+
+    Returns:
+        The plan; its ``criteria`` keep the first-seen order within the
+        materialized and the remaining criteria
+    """
+    materialized = handle.materialized if handle is not None else None
+    weights: Dict[Tuple[str, str], float] = {}
+    sources: Dict[Tuple[str, str], int] = {}
+    for tail, relation, weight in criteria:
+        key = (tail, relation)
+        weights[key] = weights.get(key, 0.0) + float(weight)
+        sources[key] = sources.get(key, 0) + 1
+
+    dropped = [key for key, weight in weights.items() if weight == 0]
+    kept = [(tail, relation, weight) for (tail, relation), weight in weights.items() if weight != 0]
+    cached = [materialized is not None and materialized.rows([criterion]) is not None for criterion in kept]
+    order = sorted(range(len(kept)), key=lambda i: not cached[i])
+    planned = [kept[i] for i in order]
+
+    if materialized is not None and planned and all(cached):
+        path = "materialized"
+    else:
+        path = "compiled" if handle is not None and handle.scorer is not None else "generic"
+
+    if len(planned) < len(criteria):
+        logger.info(f"Planned {len(planned)} of {len(criteria)} criteria ({len(dropped)} with zero weight dropped)")
+    return QueryPlan(
+        planned,
+        [sources[(tail, relation)] for tail, relation, _ in planned],
+        [cached[i] for i in order],
+        dropped,
+        len(criteria),
+        path,
+    )
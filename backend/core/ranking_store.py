@@ -0,0 +1,202 @@
+import logging
+import sys
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from cachetools import TTLCache
+
+from .utils import RANKING_STORE_TTL, RANKING_STORE_MAX_BYTES
+
+if TYPE_CHECKING:
+    from .serving_artifact import LabelIndex
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class RankingQuery:
+    """
+    ``rank_recipes`` arguments of a ranking, as compact id arrays.
+
+    Criteria and exclusions are held as relation and entity ids of the model
+    version that ranked them rather than lists of label tuples, so a stored
+    query costs a few bytes per criterion. Criteria and exclusions the
+    labels don't know are dropped, as scoring would skip them anyway.
+    """
+
+    def __init__(
+        self,
+        relation_ids: np.ndarray,
+        tail_ids: np.ndarray,
+        weights: np.ndarray,
+        flexible: bool,
+        excluded_relation_ids: np.ndarray,
+        excluded_tail_ids: np.ndarray,
+        ranges: Tuple[Tuple[str, Optional[float], Optional[float]], ...] = (),
+    ):
+        self.relation_ids = relation_ids
+        self.tail_ids = tail_ids
+        self.weights = weights
+        self.flexible = flexible
+        self.excluded_relation_ids = excluded_relation_ids
+        self.excluded_tail_ids = excluded_tail_ids
+        self.ranges = ranges
+
+    @classmethod
+    def from_criteria(
+        cls,
+        labels: "LabelIndex",
+        criteria: List[Tuple[str, str, float]],
+        flexible: bool,
+        exclusions: Optional[List[Tuple[str, str]]] = None,
+        ranges: Optional[List[Tuple[str, Optional[float], Optional[float]]]] = None,
+    ) -> "RankingQuery":
+        def known(tail: str, relation: str) -> bool:
+            return tail in labels.entity_to_id and relation in labels.relation_to_id
+
+        criteria = [(tail, relation, weight) for tail, relation, weight in criteria if known(tail, relation)]
+        exclusions = [(tail, relation) for tail, relation in exclusions or [] if known(tail, relation)]
+        return cls(
+            np.array([labels.relation_to_id[relation] for _, relation, _ in criteria], dtype=np.int32),
+            np.array([labels.entity_to_id[tail] for tail, _, _ in criteria], dtype=np.int32),
+            np.array([weight for _, _, weight in criteria], dtype=np.float64),
+            flexible,
+            np.array([labels.relation_to_id[relation] for _, relation in exclusions], dtype=np.int32),
+            np.array([labels.entity_to_id[tail] for tail, _ in exclusions], dtype=np.int32),
+            tuple(tuple(r) for r in ranges or []),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RankingQuery":
+        """Restore a query from ``to_dict`` output."""
+        relation_ids, tail_ids, weights = data["criteria"]
+        excluded_relation_ids, excluded_tail_ids = data["exclusions"]
+        return cls(
+            np.array(relation_ids, dtype=np.int32),
+            np.array(tail_ids, dtype=np.int32),
+            np.array(weights, dtype=np.float64),
+            data["flexible"],
+            np.array(excluded_relation_ids, dtype=np.int32),
+            np.array(excluded_tail_ids, dtype=np.int32),
+            tuple(tuple(r) for r in data["ranges"]),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form, for sharing the query with other worker processes."""
+        return {
+            "criteria": [self.relation_ids.tolist(), self.tail_ids.tolist(), self.weights.tolist()],
+            "flexible": self.flexible,
+            "exclusions": [self.excluded_relation_ids.tolist(), self.excluded_tail_ids.tolist()],
+            "ranges": [list(r) for r in self.ranges],
+        }
+
+    def __len__(self) -> int:
+        return len(self.relation_ids)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.relation_ids, self.tail_ids, self.weights, self.excluded_relation_ids, self.excluded_tail_ids)
+        return (
+            sum(sys.getsizeof(a) for a in arrays)
+            + sys.getsizeof(self.ranges)
+            + sum(sys.getsizeof(r) for r in self.ranges)
+        )
+
+    def arguments(self, labels: "LabelIndex") -> Dict[str, Any]:
+        """Keyword arguments of ``rank_recipes``, with the ids resolved through ``labels``."""
+        entities = labels.entity_id_to_label
+        relations = labels.relation_id_to_label
+        return {
+            "criteria": [
+                (entities[t], relations[r], w)
+                for r, t, w in zip(self.relation_ids.tolist(), self.tail_ids.tolist(), self.weights.tolist())
+            ],
+            "flexible": self.flexible,
+            "exclusions": [
+                (entities[t], relations[r])
+                for r, t in zip(self.excluded_relation_ids.tolist(), self.excluded_tail_ids.tolist())
+            ],
+            "ranges": list(self.ranges),
+        }
+
+class StoredRanking:
+    """
+    Recipe ranking held as compact typed arrays.
+
+    An incomplete ranking was cut at a shallow depth; ``query`` holds what
+    is needed to rank it deeper and counts towards ``nbytes``.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        recipe_ids: List[str],
+        scores: List[float],
+        query: Optional[RankingQuery] = None,
+        complete: bool = True,
+    ):
+        self.version = version
+        self.query = query
+        self.complete = complete
+        try:
+            self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        except ValueError:
+            self.recipe_ids = np.asarray(recipe_ids, dtype=np.str_)
+        self.scores = np.asarray(scores, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.recipe_ids)
+
+    @property
+    def nbytes(self) -> int:
+        size = sys.getsizeof(self.recipe_ids) + sys.getsizeof(self.scores)
+        return size + self.query.nbytes if self.query is not None else size
+
+    def page(self, offset: int, limit: int) -> Tuple[List[str], List[float]]:
+        """Slice a page of the ranking."""
+        end = offset + limit
+        return (
+            [str(rid) for rid in self.recipe_ids[offset:end]],
+            self.scores[offset:end].tolist(),
+        )
+
+class RankingStore:
+    """
+    TTL store of rankings behind result cursors.
+
+    Bounded by the total size of the stored arrays and queries rather than
+    the entry count; the least recently used rankings are evicted first.
+    """
+
+    def __init__(self, max_bytes: int = RANKING_STORE_MAX_BYTES, ttl: float = RANKING_STORE_TTL):
+        self._rankings = TTLCache(maxsize=max_bytes, ttl=ttl, getsizeof=lambda ranking: max(ranking.nbytes, 1))
+        self._lock = threading.Lock()
+
+    def put(
+        self,
+        cursor: str,
+        version: str,
+        recipe_ids: List[str],
+        scores: List[float],
+        query: Optional[RankingQuery] = None,
+        complete: bool = True,
+    ) -> StoredRanking:
+        """Store a ranking under the given cursor and return it."""
+        ranking = StoredRanking(version, recipe_ids, scores, query, complete)
+        with self._lock:
+            try:
+                self._rankings[cursor] = ranking
+            except ValueError:
+                logger.warning(f"Ranking of {ranking.nbytes} bytes exceeds the store budget, not stored")
+        return ranking
+
+    def get(self, cursor: str) -> Optional[StoredRanking]:
+        """Return the ranking behind a cursor, or None if it expired or never existed."""
+        with self._lock:
+            return self._rankings.get(cursor)
+
+    def __contains__(self, cursor: str) -> bool:
+        with self._lock:
+            return cursor in self._rankings
+
+ranking_store = RankingStore()
@@ -0,0 +1,118 @@
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+from pykeen.triples import TriplesFactory
+
+if TYPE_CHECKING:
+    from .serving_artifact import LabelIndex
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Relations whose tails can be excluded from recommendations
+EXCLUDABLE_RELATIONS = ("containsIngredient", "hasDietType", "hasCuisineRegion")
+
+def attribute_triples(
+    triples_factory: TriplesFactory, relations: Tuple[str, ...] = EXCLUDABLE_RELATIONS
+) -> np.ndarray:
+    """Mapped triples of the relations recipes can be filtered by."""
+    relation_ids = [triples_factory.relation_to_id[r] for r in relations if r in triples_factory.relation_to_id]
+    mapped = triples_factory.mapped_triples.numpy()
+    return mapped[np.isin(mapped[:, 1], relation_ids)].astype(np.int32)
+
+class RecipeAttributeIndex:
+    """
+    Recipe sets per (relation, tail) attribute, built from the graph triples.
+
+    Sets are addressed by recipe position, i.e. the index into ``recipe_ids``
+    that the scorers rank over. Sets covering more than 1/32 of the recipes
+    are held as packed bitmasks, sparser ones as sorted positions, whichever
+    is smaller.
+    """
+
+    def __init__(
+        self,
+        labels: "LabelIndex",
+        triples: np.ndarray,
+        recipe_ids: torch.LongTensor,
+        relations: Tuple[str, ...] = EXCLUDABLE_RELATIONS,
+    ):
+        self.recipe_ids = recipe_ids
+        self.num_recipes = len(recipe_ids)
+        self._bitmasks: Dict[Tuple[str, str], np.ndarray] = {}
+        self._positions: Dict[Tuple[str, str], np.ndarray] = {}
+
+        position = np.full(labels.num_entities, -1, dtype=np.int64)
+        position[recipe_ids.numpy()] = np.arange(self.num_recipes)
+
+        relation_ids = [labels.relation_to_id[r] for r in relations if r in labels.relation_to_id]
+        mapped = triples[np.isin(triples[:, 1], relation_ids)]
+        heads = position[mapped[:, 0]]
+        mapped, heads = mapped[heads >= 0], heads[heads >= 0]
+
+        # Group recipe positions by (relation, tail)
+        keys = mapped[:, 1].astype(np.int64) * labels.num_entities + mapped[:, 2]
+        order = np.lexsort((heads, keys))
+        keys, heads = keys[order], heads[order]
+        unique_keys, starts = np.unique(keys, return_index=True)
+        ends = np.append(starts[1:], len(keys))
+
+        entity_labels = labels.entity_id_to_label
+        relation_labels = labels.relation_id_to_label
+        for key, start, end in zip(unique_keys.tolist(), starts.tolist(), ends.tolist()):
+            relation, tail = divmod(key, labels.num_entities)
+            attribute = (relation_labels[relation], entity_labels[tail].casefold())
+            positions = np.unique(heads[start:end]).astype(np.int32)
+            if positions.nbytes > (self.num_recipes + 7) // 8:
+                bitmask = np.zeros(self.num_recipes, dtype=bool)
+                bitmask[positions] = True
+                self._bitmasks[attribute] = np.packbits(bitmask)
+            else:
+                self._positions[attribute] = positions
+
+        logger.info(
+            f"Indexed {len(self._bitmasks) + len(self._positions)} recipe attributes "
+            f"({len(self._bitmasks)} bitmasks) in {self.nbytes / (1024 * 1024):.2f}MB"
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self._bitmasks.values()) + sum(a.nbytes for a in self._positions.values())
+
+    def __contains__(self, attribute: Tuple[str, str]) -> bool:
+        tail, relation = attribute
+        key = (relation, tail.casefold())
+        return key in self._bitmasks or key in self._positions
+
+    def mask(self, attributes: List[Tuple[str, str]]) -> Optional[np.ndarray]:
+        """
+        Union of the recipe sets of the given (tail, relation) attributes.
+
+        Returns:
+            Boolean array over recipe positions, or None if no attribute matched
+        """
+        packed = None
+        positions = []
+        for tail, relation in attributes:
+            key = (relation, tail.casefold())
+            if key in self._bitmasks:
+                if packed is None:
+                    packed = self._bitmasks[key].copy()
+                else:
+                    np.bitwise_or(packed, self._bitmasks[key], out=packed)
+            elif key in self._positions:
+                positions.append(self._positions[key])
+            else:
+                logger.warning(f"Ignoring unknown attribute {relation}, {tail}")
+
+        if packed is None and not positions:
+            return None
+        if packed is not None:
+            result = np.unpackbits(packed, count=self.num_recipes).astype(bool)
+        else:
+            result = np.zeros(self.num_recipes, dtype=bool)
+        if positions:
+            result[np.concatenate(positions)] = True
+        return result
@@ -0,0 +1,205 @@
+import logging
+import mmap
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .utils import RECIPE_TEXT_DIR
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Free-text columns only needed to display a single recipe
+LONG_TEXT_COLUMNS = ("Description", "RecipeInstructions", "ScrapedIngredients", "RecipeIngredientParts")
+
+class _TextBlob:
+    """
+    Long text fields stored back to back in an unlinked temporary file.
+
+    Only the offsets stay in memory; the text is read through a read-only
+    mmap, so untouched pages cost no resident memory.
+    """
+
+    def __init__(self, columns: Dict[str, pd.Series], directory: Optional[str] = RECIPE_TEXT_DIR):
+        self.columns = list(columns)
+        num_rows = len(next(iter(columns.values()))) if columns else 0
+        self._offsets = np.zeros((len(self.columns), num_rows + 1), dtype=np.int64)
+        self._missing = np.zeros((len(self.columns), num_rows), dtype=bool)
+
+        self._file = tempfile.TemporaryFile(dir=directory, prefix="recipe_text_")
+        position = 0
+        for i, values in enumerate(columns.values()):
+            self._missing[i] = values.isna().to_numpy()
+            encoded = [b"" if missing else str(value).encode("utf-8") for value, missing in zip(values.tolist(), self._missing[i])]
+            self._offsets[i, 0] = position
+            self._offsets[i, 1:] = position + np.cumsum([len(data) for data in encoded], dtype=np.int64)
+            self._file.write(b"".join(encoded))
+            position = int(self._offsets[i, -1])
+            del encoded
+        self._file.flush()
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if position else None
+
+    @property
+    def nbytes(self) -> int:
+        """Resident size of the index; the text itself lives on disk."""
+        return self._offsets.nbytes + self._missing.nbytes
+
+    @property
+    def disk_bytes(self) -> int:
+        return int(self._offsets[:, -1].max()) if self._offsets.size else 0
+
+    def get(self, column: int, row: int) -> Any:
+        if self._missing[column, row]:
+            return float("nan")
+        start, end = self._offsets[column, row], self._offsets[column, row + 1]
+        return self._mmap[start:end].decode("utf-8") if end > start else ""
+
+class RecipeStore:
+    """
+    Column-wise, compact in-memory copy of the recipe table.
+
+    String columns are dictionary encoded (interned values plus integer
+    codes), numeric columns are typed arrays, using float32 where it
+    reproduces every value exactly, and long free-text columns are kept in
+    a memory-mapped text blob. ``get`` rebuilds a row with the same
+    values as the pandas row it was built from.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.columns: List[str] = list(df.columns)
+        self._num_rows = len(df)
+        self._kinds: Dict[str, str] = {}
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._categories: Dict[str, List[str]] = {}
+
+        text_columns = {}
+        for column in self.columns:
+            values = df[column]
+            if column in LONG_TEXT_COLUMNS:
+                self._kinds[column] = "text"
+                text_columns[column] = values
+            elif pd.api.types.is_integer_dtype(values.dtype):
+                self._kinds[column] = "int"
+                array = values.to_numpy()
+                fits = array.size == 0 or (array.min() >= np.iinfo(np.int32).min and array.max() <= np.iinfo(np.int32).max)
+                self._arrays[column] = array.astype(np.int32 if fits else np.int64)
+            elif pd.api.types.is_float_dtype(values.dtype):
+                array = values.to_numpy(dtype=np.float64)
+                reduced = array.astype(np.float32)
+                # float32 values are read back through their shortest repr, which
+                # restores the original float64 as long as it had few enough digits
+                if np.array_equal(reduced.astype(str).astype(np.float64), array, equal_nan=True):
+                    self._kinds[column] = "float32"
+                    self._arrays[column] = reduced
+                else:
+                    self._kinds[column] = "float"
+                    self._arrays[column] = array
+            elif pd.api.types.is_string_dtype(values.dtype) or values.dtype == object:
+                self._kinds[column] = "category"
+                codes, uniques = pd.factorize(values, use_na_sentinel=True)
+                self._categories[column] = [sys.intern(str(value)) for value in uniques]
+                self._arrays[column] = codes.astype(np.int16 if len(uniques) < np.iinfo(np.int16).max else np.int32)
+            else:
+                self._kinds[column] = "object"
+                self._arrays[column] = values.to_numpy(dtype=object)
+
+        self._text_index = {column: i for i, column in enumerate(text_columns)}
+        self._text = _TextBlob(text_columns)
+
+        # First row per RecipeId, matching a boolean-mask lookup on the DataFrame
+        ids = df["RecipeId"].to_numpy() if "RecipeId" in df.columns else np.array([], dtype=np.int64)
+        self._order = np.argsort(ids, kind="stable")
+        self._sorted_ids = ids[self._order]
+
+        logger.info(
+            f"Built recipe store with {len(df)} recipes: {self.nbytes / (1024 * 1024):.2f}MB in memory, "
+            f"{self._text.disk_bytes / (1024 * 1024):.2f}MB of text on disk"
+        )
+
+    @classmethod
+    def from_csv(cls, path: Path) -> "RecipeStore":
+        if not path.exists():
+            raise FileNotFoundError(f"CSV not found at {path}")
+        logger.info(f"Loading recipes from {path}")
+        return cls(pd.read_csv(path))
+
+    def __len__(self) -> int:
+        return self._num_rows
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size, excluding the mmapped text."""
+        size = sum(a.nbytes for a in self._arrays.values()) + self._order.nbytes + self._sorted_ids.nbytes
+        size += sum(sys.getsizeof(v) for values in self._categories.values() for v in values)
+        return size + self._text.nbytes
+
+    def _row(self, recipe_id: int) -> Optional[int]:
+        try:
+            position = np.searchsorted(self._sorted_ids, recipe_id)
+        except OverflowError:
+            return None
+        if position == len(self._sorted_ids) or self._sorted_ids[position] != recipe_id:
+            return None
+        return int(self._order[position])
+
+    def _value(self, column: str, row: int) -> Any:
+        kind = self._kinds[column]
+        if kind == "text":
+            return self._text.get(self._text_index[column], row)
+        value = self._arrays[column][row]
+        if kind == "category":
+            return self._categories[column][value] if value >= 0 else float("nan")
+        if kind == "int":
+            return int(value)
+        if kind == "float32":
+            return float(str(value))
+        if kind == "float":
+            return float(value)
+        return value
+
+    def get(self, recipe_id: int) -> Optional[Dict[str, Any]]:
+        """All fields of a recipe, or None if the id is unknown."""
+        row = self._row(recipe_id)
+        if row is None:
+            return None
+        return {column: self._value(column, row) for column in self.columns}
+
+    def numeric_values(self, column: str, recipe_ids: np.ndarray) -> np.ndarray:
+        """
+        Values of a numeric column for the given recipe ids as float64.
+
+        Unknown ids and missing values are NaN. float32 columns are restored
+        through their repr, like ``get`` does, so range comparisons see the
+        values of the CSV.
+        """
+        kind = self._kinds[column]
+        if kind not in ("int", "float32", "float"):
+            raise ValueError(f"Column {column} is not numeric")
+
+        result = np.full(len(recipe_ids), np.nan)
+        positions = np.searchsorted(self._sorted_ids, recipe_ids)
+        positions = np.minimum(positions, max(len(self._sorted_ids) - 1, 0))
+        found = (self._sorted_ids[positions] == recipe_ids) if len(self._sorted_ids) else np.zeros(len(recipe_ids), dtype=bool)
+        values = self._arrays[column][self._order[positions[found]]]
+        if kind == "float32":
+            values = values.astype(str).astype(np.float64)
+        result[found] = values
+        return result
+
+    def value_counts(self, column: str) -> List[Tuple[Any, int]]:
+        """Non-missing values of a column with the number of recipes having them."""
+        if self._kinds[column] == "category":
+            counts = np.bincount(self._arrays[column][self._arrays[column] >= 0], minlength=len(self._categories[column]))
+            return [(value, int(count)) for value, count in zip(self._categories[column], counts) if count]
+
+        counter = Counter()
+        for row in range(len(self)):
+            value = self._value(column, row)
+            if not (isinstance(value, float) and np.isnan(value)):
+                counter[value] += 1
+        return list(counter.items())
@@ -1,15 +1,24 @@
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Union
 import logging
 import pandas as pd
 import numpy as np
 import torch
 import gc
+import difflib
 from sklearn.preprocessing import MinMaxScaler
 from pykeen.predict import predict_target
 
-from .model_manager import model_manager
-from .utils import map_health_attribute
-from .data_loading import recipes_df
+from .model_manager import model_manager, ModelHandle
+from .quantization import ReducedPrecisionModel
+from .scoring_kernel import CompiledScorer
+from .serving_artifact import LabelIndex
+from .sharded_scoring import ShardedScorer
+from .materialize import MaterializedScores
+from .nutrition_index import NutritionIndex
+from .query_planner import QueryPlan, plan_query
+from .utils import map_health_attribute, split_and_clean
+from .vocabulary import VocabularyIndex, UnknownCriteriaError, SUGGEST_MAX_VALUES
+from .data_loading import recipe_store
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -24,6 +33,71 @@ def _normalize_scores(df: pd.DataFrame) -> pd.DataFrame:
     df["normalized_score"] = scaler.fit_transform(df[["score"]])
     return df
 
+def _predict_reduced_precision(
+    model: ReducedPrecisionModel,
+    relation: str,
+    tail: str,
+    labels: LabelIndex
+) -> pd.DataFrame:
+    """Head predictions from a reduced-precision model, shaped like predict_target's DataFrame."""
+    scores = model.score_h(
+        labels.relation_to_id[relation],
+        labels.entity_to_id[tail]
+    )
+    return pd.DataFrame({
+        "head_id": np.arange(len(scores)),
+        "score": scores.numpy(),
+    })
+
+def _predict_full_precision(model, relation: str, tail: str, labels: LabelIndex) -> pd.DataFrame:
+    """Head predictions through predict_target by id; labels are looked up for the final ranking only."""
+    preds = predict_target(
+        model=model, 
+        relation=labels.relation_to_id[relation], 
+        tail=labels.entity_to_id[tail]
+    ).df
+    return preds[["head_id", "score"]]
+
+class _CriteriaResolver:
+    """Resolves request values through the vocabulary and collects unknown ones."""
+
+    def __init__(self, vocabulary: VocabularyIndex):
+        self.vocabulary = vocabulary
+        self.unknown: Dict[str, List[str]] = {}
+        self._resolved: Dict[Tuple[str, str], Optional[str]] = {}
+
+    def resolve(self, attribute_type: str, values: List[str], split: bool = False) -> List[str]:
+        """
+        Resolve values to entity labels. With ``split``, comma-separated values
+        are resolved element-wise, matching how list attributes enter the graph.
+        """
+        if split:
+            values = [part for value in values for part in split_and_clean(value, ",")]
+        labels = []
+        for value in values:
+            if not value.strip():
+                continue
+            # Repeated values are looked up (and fuzzy-matched) once
+            key = (attribute_type, value)
+            if key not in self._resolved:
+                self._resolved[key] = self.vocabulary.resolve(attribute_type, value)
+            label = self._resolved[key]
+            if label is None:
+                self.unknown.setdefault(attribute_type, []).append(value)
+            else:
+                labels.append(label)
+        return labels
+
+    def raise_for_unknown(self) -> None:
+        if self.unknown:
+            # Only the first few values get suggestions, each one scans the vocabulary
+            values = [(attribute_type, value) for attribute_type, values in self.unknown.items() for value in values]
+            suggestions = {
+                value: self.vocabulary.suggest(attribute_type, value)
+                for attribute_type, value in values[:SUGGEST_MAX_VALUES]
+            }
+            raise UnknownCriteriaError(self.unknown, suggestions)
+
 def map_user_input_to_criteria(
     cooking_method: str,
     diet_types: List[str],
@@ -32,6 +106,7 @@ def map_user_input_to_criteria(
     cuisine_region: str,
     ingredients: List[str],
     weights: Dict[str, float],
+    vocabulary: Optional[VocabularyIndex] = None,
 ) -> List[Tuple[str, str, float]]:
     """
     Convert user input into criteria triples for prediction.
@@ -44,171 +119,345 @@ def map_user_input_to_criteria(
         cuisine_region: Cuisine region preference
         ingredients: Ingredient preferences
         weights: Importance weights for each criterion
+        vocabulary: Vocabulary to resolve values with (defaults to the current model's)
         
     Returns:
         List of (tail_entity, relation, weight) triples
+        
+    Raises:
+        UnknownCriteriaError: If any value doesn't match the vocabulary
     """
     logger.info("Mapping user input to criteria")
+    resolver = _CriteriaResolver(vocabulary or model_manager.get_handle().vocabulary)
     criteria = []
     default_weight = 1.0
     
-    if cooking_method:
-        cm = cooking_method.strip().lower()
-        tail = f"cooking_method_{cm}"
+    for tail in resolver.resolve("cooking_method", [cooking_method] if cooking_method else []):
         criteria.append((
             tail, 
             "usesCookingMethod", 
             weights.get("cooking_method", default_weight)
         ))
 
-    for dt in diet_types:
-        dt_clean = dt.strip()
-        tail = f"diet_type_{dt_clean}"
+    for tail in resolver.resolve("diet_type", diet_types, split=True):
         criteria.append((
             tail, 
             "hasDietType", 
             weights.get("diet_types", default_weight)
         ))
 
-    for mt in meal_type:
-        mt_clean = mt.strip()
-        tail = f"meal_type_{mt_clean}"
+    for tail in resolver.resolve("meal_type", meal_type, split=True):
         criteria.append((
             tail, 
             "isForMealType", 
             weights.get("meal_type", default_weight)
         ))
 
-    for ht in health_types:
-        ht_clean = ht.strip()
-        relation = map_health_attribute(ht_clean)
-        tail = f"health_attribute_{ht_clean}"
+    for tail in resolver.resolve("health_attribute", health_types, split=True):
+        relation = map_health_attribute(resolver.vocabulary.value_of("health_attribute", tail))
         criteria.append((
             tail, 
             relation, 
             weights.get("healthy_type", default_weight)
         ))
 
-    if cuisine_region:
-        cr = cuisine_region.strip()
-        tail = f"cuisine_region_{cr}"
+    for tail in resolver.resolve("cuisine_region", [cuisine_region] if cuisine_region else []):
         criteria.append((
             tail, 
             "hasCuisineRegion", 
             weights.get("cuisine_region", default_weight)
         ))
 
-    for ing in ingredients:
-        ing_clean = ing.strip()
-        tail = f"ingredient_{ing_clean}"
+    for tail in resolver.resolve("ingredient", ingredients):
         criteria.append((
             tail, 
             "containsIngredient", 
             weights.get("ingredients", default_weight)
         ))
 
+    resolver.raise_for_unknown()
     logger.info(f"Created {len(criteria)} criteria from user input")
     return criteria
 
-def get_matching_recipes(
-    criteria: List[Tuple[str, str, float]], 
-    top_k: int = 5, 
-    flexible: bool = False
-) -> List[str]:
+def map_user_input_to_exclusions(
+    ingredients: List[str],
+    diet_types: List[str],
+    cuisine_regions: List[str],
+    vocabulary: Optional[VocabularyIndex] = None,
+) -> List[Tuple[str, str]]:
     """
-    Find recipes matching the given criteria.
+    Convert user exclusions into (tail_entity, relation) attributes.
     
     Args:
-        criteria: List of (tail_entity, relation, weight) triples
-        top_k: Number of recipes to return
-        flexible: Whether to use flexible matching (OR) or strict matching (AND)
+        ingredients: Ingredients the recipes must not contain
+        diet_types: Diet types the recipes must not have
+        cuisine_regions: Cuisine regions the recipes must not belong to
+        vocabulary: Vocabulary to resolve values with (defaults to the current model's)
         
     Returns:
-        List of matching recipe IDs
+        List of (tail_entity, relation) pairs
+        
+    Raises:
+        UnknownCriteriaError: If any value doesn't match the vocabulary, so a
+            misspelled allergen is never silently ignored
     """
-    if not criteria:
-        logger.warning("No criteria provided for recommendation")
-        return []
+    resolver = _CriteriaResolver(vocabulary or model_manager.get_handle().vocabulary)
+    exclusions = [(tail, "containsIngredient") for tail in resolver.resolve("ingredient", ingredients)]
+    exclusions += [(tail, "hasDietType") for tail in resolver.resolve("diet_type", diet_types, split=True)]
+    exclusions += [(tail, "hasCuisineRegion") for tail in resolver.resolve("cuisine_region", cuisine_regions)]
+    resolver.raise_for_unknown()
+    return exclusions
 
-    logger.info(f"Finding recipes matching {len(criteria)} criteria (flexible={flexible})")
+def map_user_input_to_ranges(
+    nutrition: Dict[str, Any],
+    index: Optional[NutritionIndex] = None,
+) -> List[Tuple[str, Optional[float], Optional[float]]]:
+    """
+    Convert user nutrition ranges into (column, min, max) filters.
     
-    try:
-        # Get model and triples factory from singleton
-        model, triples_factory = model_manager.get_model_and_triples()
+    Args:
+        nutrition: NutritionRange bounds keyed by recipe column, matched
+            case-insensitively
+        index: Nutrition index to validate the columns against (defaults to the current model's)
         
-        all_preds = []
-        for tail, relation, weight in criteria:
-            try:
-                # Use with torch.no_grad for memory efficiency
-                with torch.no_grad():
-                    preds = predict_target(
-                        model=model, 
-                        relation=relation, 
-                        tail=tail, 
-                        triples_factory=triples_factory
-                    ).df
-                
-                preds = _normalize_scores(preds)
-                preds["weighted_score"] = preds["normalized_score"] * weight
-                preds = preds[["head_label", "weighted_score"]]
-                all_preds.append(preds)
-                
-                # Clear unnecessary variables to free memory
-                del preds
-            except Exception as e:
-                logger.error(f"Error predicting for {relation}, {tail}: {str(e)}")
-                continue
-
-        if not all_preds:
-            logger.warning("No valid predictions obtained")
-            return []
+    Returns:
+        List of (column, min, max) ranges sorted by column, one per column;
+        bounds given for a column under several spellings are intersected,
+        unbounded ranges are dropped
         
-        # Process with careful memory management
-        merged = all_preds[0].copy()
-        for i, other in enumerate(all_preds[1:]):
-            if flexible:
-                # OR logic - keep recipes that match any criterion
-                merged = merged.merge(
-                    other, 
-                    on="head_label", 
-                    how="outer", 
-                    suffixes=("", "_y")
-                )
-                merged["weighted_score"] = (
-                    merged["weighted_score"].fillna(0) + 
-                    merged["weighted_score_y"].fillna(0)
-                )
-                merged.drop(columns=["weighted_score_y"], inplace=True)
-            else:
-                # AND logic - only keep recipes that match all criteria
-                merged = merged.merge(
-                    other, 
-                    on="head_label", 
-                    how="inner", 
-                    suffixes=("", "_y")
-                )
-                merged["weighted_score"] += merged["weighted_score_y"]
-                merged.drop(columns=["weighted_score_y"], inplace=True)
+    Raises:
+        UnknownCriteriaError: If a column can't be filtered on
+    """
+    index = index or model_manager.get_handle().nutrition
+    columns = {column.casefold(): column for column in index.columns}
+    merged: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+    unknown = []
+    for name, bounds in nutrition.items():
+        column = columns.get(name.strip().casefold())
+        if column is None:
+            unknown.append(name)
+            continue
+        low, high = merged.get(column, (None, None))
+        if bounds.min is not None:
+            low = bounds.min if low is None else max(low, bounds.min)
+        if bounds.max is not None:
+            high = bounds.max if high is None else min(high, bounds.max)
+        merged[column] = (low, high)
+
+    if unknown:
+        suggestions = {
+            name: difflib.get_close_matches(name, index.columns, n=3, cutoff=0.6)
+            for name in unknown[:SUGGEST_MAX_VALUES]
+        }
+        raise UnknownCriteriaError({"nutrition": unknown}, suggestions)
+    return [
+        (column, low, high)
+        for column, (low, high) in sorted(merged.items())
+        if low is not None or high is not None
+    ]
+
+def _parse_recipe_id(node_str: str) -> str:
+    """Extract the recipe ID from a recipe node label."""
+    return node_str.split("recipe_", 1)[1]
+
+def _rank_recipes_generic(
+    model,
+    labels: LabelIndex,
+    recipe_ids: torch.LongTensor,
+    criteria: List[Tuple[str, str, float]],
+    limit: int,
+    flexible: bool,
+    excluded: Optional[np.ndarray] = None
+) -> Tuple[List[str], List[float]]:
+    """
+    Rank recipes through pykeen's predict_target, one pass per criterion.
+    
+    Predictions are merged by entity id and restricted to ``recipe_ids``
+    minus the ``excluded`` mask over them; only the returned recipes are
+    looked up in the label index.
+    """
+    all_preds = []
+    for tail, relation, weight in criteria:
+        try:
+            # Use with torch.no_grad for memory efficiency
+            with torch.no_grad():
+                if isinstance(model, ReducedPrecisionModel):
+                    preds = _predict_reduced_precision(model, relation, tail, labels)
+                else:
+                    preds = _predict_full_precision(model, relation, tail, labels)
             
-            # Clean up to save memory
-            all_preds[i+1] = None
+            preds = _normalize_scores(preds)
+            preds["weighted_score"] = preds["normalized_score"] * weight
+            preds = preds[["head_id", "weighted_score"]]
+            all_preds.append(preds)
             
-        # Filter to only recipe nodes and sort by score
-        merged = merged[merged["head_label"].str.startswith("recipe_")]
-        merged.sort_values(by="weighted_score", ascending=False, inplace=True)
-        merged = merged.head(top_k)
-
-        # Extract recipe IDs from node labels
-        def parse_recipe_id(node_str: str) -> str:
-            return node_str.split("recipe_", 1)[1]
+            # Clear unnecessary variables to free memory
+            del preds
+        except Exception as e:
+            logger.error(f"Error predicting for {relation}, {tail}: {str(e)}")
+            continue
 
-        ids = merged["head_label"].apply(parse_recipe_id).to_list()
-        logger.info(f"Found {len(ids)} matching recipes")
+    if not all_preds:
+        logger.warning("No valid predictions obtained")
+        return [], []
+    
+    # Process with careful memory management
+    merged = all_preds[0].copy()
+    for i, other in enumerate(all_preds[1:]):
+        if flexible:
+            # OR logic - keep recipes that match any criterion
+            merged = merged.merge(
+                other, 
+                on="head_id", 
+                how="outer", 
+                suffixes=("", "_y")
+            )
+            merged["weighted_score"] = (
+                merged["weighted_score"].fillna(0) + 
+                merged["weighted_score_y"].fillna(0)
+            )
+            merged.drop(columns=["weighted_score_y"], inplace=True)
+        else:
+            # AND logic - only keep recipes that match all criteria
+            merged = merged.merge(
+                other, 
+                on="head_id", 
+                how="inner", 
+                suffixes=("", "_y")
+            )
+            merged["weighted_score"] += merged["weighted_score_y"]
+            merged.drop(columns=["weighted_score_y"], inplace=True)
+        
+        # Clean up to save memory
+        all_preds[i+1] = None
         
-        # Clean up for good measure
-        del merged, all_preds
+    # Filter to the recipes that aren't excluded and sort by score
+    allowed = recipe_ids.numpy() if excluded is None else recipe_ids.numpy()[~excluded]
+    merged = merged[merged["head_id"].isin(allowed)]
+    merged.sort_values(by="weighted_score", ascending=False, inplace=True)
+    merged = merged.head(limit)
+
+    entity_labels = labels.entity_id_to_label
+    ids = [_parse_recipe_id(entity_labels[i]) for i in merged["head_id"].tolist()]
+    scores = merged["weighted_score"].to_list()
+    
+    # Clean up for good measure
+    del merged, all_preds
+    
+    return ids, scores
+
+def _rank_recipes_compiled(
+    scorer: Union[CompiledScorer, ShardedScorer],
+    labels: LabelIndex,
+    criteria: List[Tuple[str, str, float]],
+    limit: int,
+    excluded: Optional[np.ndarray] = None
+) -> Tuple[List[str], List[float]]:
+    """
+    Rank recipes with the compiled scoring kernel in a single pass.
+
+    Every criterion scores all entities, so strict and flexible matching rank
+    the same candidate set and need no separate merge step. Recipes in the
+    ``excluded`` mask are dropped before top-k selection.
+    """
+    relation_ids, tail_ids, weights = [], [], []
+    for tail, relation, weight in criteria:
+        if tail not in labels.entity_to_id or relation not in labels.relation_to_id:
+            logger.error(f"Error predicting for {relation}, {tail}: unknown entity or relation")
+            continue
+        relation_ids.append(labels.relation_to_id[relation])
+        tail_ids.append(labels.entity_to_id[tail])
+        weights.append(weight)
+
+    if not relation_ids:
+        logger.warning("No valid predictions obtained")
+        return [], []
+
+    positions, scores = scorer.topk(relation_ids, tail_ids, weights, limit, excluded)
+    entity_labels = labels.entity_id_to_label
+    ids = [_parse_recipe_id(entity_labels[i]) for i in scorer.recipe_ids[positions].tolist()]
+    return ids, scores.tolist()
+
+def _rank_recipes_materialized(
+    materialized: MaterializedScores,
+    labels: LabelIndex,
+    criteria: List[Tuple[str, str, float]],
+    limit: int,
+    excluded: Optional[np.ndarray] = None
+) -> Optional[Tuple[List[str], List[float]]]:
+    """
+    Rank recipes from the precomputed score matrix.
+
+    Returns None if any criterion wasn't materialized, so the caller can fall
+    back to scoring with the model.
+    """
+    rows = materialized.rows(criteria)
+    if rows is None:
+        return None
+
+    positions, scores = materialized.topk(rows, [weight for _, _, weight in criteria], limit, excluded)
+    entity_labels = labels.entity_id_to_label
+    ids = [_parse_recipe_id(entity_labels[i]) for i in materialized.recipe_ids[positions].tolist()]
+    return ids, scores.tolist()
+
+def rank_recipes(
+    criteria: List[Tuple[str, str, float]],
+    limit: int,
+    flexible: bool = False,
+    handle: Optional[ModelHandle] = None,
+    exclusions: Optional[List[Tuple[str, str]]] = None,
+    ranges: Optional[List[Tuple[str, Optional[float], Optional[float]]]] = None,
+    plan: Optional[QueryPlan] = None
+) -> Tuple[List[str], List[float]]:
+    """
+    Rank recipes for the given criteria.
+    
+    Args:
+        criteria: List of (tail_entity, relation, weight) triples
+        limit: Maximum ranking depth to return
+        flexible: Whether to use flexible matching (OR) or strict matching (AND)
+        handle: Model version to score with (defaults to the current one)
+        exclusions: (tail_entity, relation) attributes whose recipes are removed
+            before top-k selection
+        ranges: (column, min, max) nutrition ranges recipes must fall within;
+            recipes outside them are excluded like ``exclusions``. Only the
+            dense materialized path scores fewer recipes for them: model
+            scores are min-max normalized over all entities, so the compiled,
+            sharded and generic paths still score every entity
+        plan: Query plan of ``criteria`` if the caller already made one
         
-        return ids
+    Returns:
+        Recipe IDs and their aggregated scores, best first
+    """
+    if not criteria:
+        logger.warning("No criteria provided for recommendation")
+        return [], []
+
+    logger.info(f"Ranking recipes for {len(criteria)} criteria (flexible={flexible}, limit={limit})")
+    
+    try:
+        # Pin one model version for the whole request
+        handle = handle or model_manager.get_handle()
+        # Repeated criteria are scored once with their summed weight
+        criteria = (plan or plan_query(criteria, handle)).criteria
+        if not criteria:
+            logger.warning("All criteria have zero weight")
+            return [], []
+        excluded = handle.attributes.mask(exclusions) if exclusions else None
+        if ranges:
+            excluded = handle.nutrition.excluded(ranges, excluded)
+
+        if handle.materialized is not None:
+            ranked = _rank_recipes_materialized(handle.materialized, handle.labels, criteria, limit, excluded)
+            if ranked is not None:
+                return ranked
+            logger.info("Criteria not materialized, scoring with the model")
+
+        if handle.scorer is not None:
+            return _rank_recipes_compiled(handle.scorer, handle.labels, criteria, limit, excluded)
+        return _rank_recipes_generic(
+            handle.model, handle.labels, handle.attributes.recipe_ids, criteria, limit, flexible, excluded
+        )
     
     finally:
         # Force garbage collection
@@ -216,6 +465,32 @@ def get_matching_recipes(
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
 
+def get_matching_recipes(
+    criteria: List[Tuple[str, str, float]], 
+    top_k: int = 5, 
+    flexible: bool = False,
+    handle: Optional[ModelHandle] = None,
+    exclusions: Optional[List[Tuple[str, str]]] = None,
+    ranges: Optional[List[Tuple[str, Optional[float], Optional[float]]]] = None
+) -> List[str]:
+    """
+    Find recipes matching the given criteria.
+    
+    Args:
+        criteria: List of (tail_entity, relation, weight) triples
+        top_k: Number of recipes to return
+        flexible: Whether to use flexible matching (OR) or strict matching (AND)
+        handle: Model version to score with (defaults to the current one)
+        exclusions: (tail_entity, relation) attributes whose recipes are excluded
+        ranges: (column, min, max) nutrition ranges recipes must fall within
+        
+    Returns:
+        List of matching recipe IDs
+    """
+    ids, _ = rank_recipes(criteria, top_k, flexible, handle, exclusions, ranges)
+    logger.info(f"Found {len(ids)} matching recipes")
+    return ids
+
 def fetch_recipe_info(recipe_id: str) -> Optional[Dict[str, Any]]:
     """
     Fetch detailed information for a specific recipe.
@@ -233,12 +508,11 @@ def fetch_recipe_info(recipe_id: str) -> Optional[Dict[str, Any]]:
         logger.error(f"Invalid recipe ID: {recipe_id}")
         return None
 
-    row = recipes_df[recipes_df["RecipeId"] == rid_int]
+    result = recipe_store.get(rid_int)
     
-    if row.empty:
+    if result is None:
         logger.warning(f"Recipe not found: {rid_int}")
         return None
     
-    result = row.iloc[0].to_dict()
     logger.info(f"Found recipe: {result.get('Name', 'Unknown')}")
     return result
\ No newline at end of file
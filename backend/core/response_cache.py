@@ -0,0 +1,182 @@
+import json
+import hashlib
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from cachetools import TTLCache
+
+from .utils import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_DIR, RESPONSE_CACHE_DISK_SIZE
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def canonical_request_key(
+    criteria: List[Tuple[str, str, float]],
+    top_k: int,
+    flexible: bool,
+    version: str,
+    exclusions: Optional[List[Tuple[str, str]]] = None,
+    ranges: Optional[List[Tuple[str, Optional[float], Optional[float]]]] = None
+) -> str:
+    """
+    Build the cache key of a recommendation request.
+
+    The key is derived from the mapped criteria rather than the raw request,
+    so list order, whitespace, casing that the mapping normalizes away and
+    omitted default weights all lead to the same key. Exclusions are matched
+    case-insensitively and deduplicated, nutrition ranges are keyed by
+    their numeric bounds.
+    """
+    canonical = {
+        "version": version,
+        "criteria": sorted([tail, relation, float(weight)] for tail, relation, weight in criteria),
+        "exclusions": sorted({(tail.casefold(), relation) for tail, relation in exclusions or []}),
+        "top_k": top_k,
+        "flexible": flexible,
+    }
+    if ranges:
+        canonical["ranges"] = sorted(
+            [column, None if low is None else float(low), None if high is None else float(high)]
+            for column, low, high in ranges
+        )
+    payload = json.dumps(canonical, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class _DiskTier:
+    """
+    SQLite-backed cache tier shared by all worker processes on a host.
+
+    Keys embed the model version, so entries of several versions can live
+    side by side; stale ones age out through the TTL and the size bound.
+    """
+
+    TRIM_INTERVAL = 1000
+
+    def __init__(self, directory: str, max_entries: int, ttl: float):
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        self.db_path = path / "recommendations.sqlite3"
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = itertools.count(1)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, version TEXT, value TEXT, expires REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=1.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, version: str) -> Optional[Any]:
+        row = self._connection().execute(
+            "SELECT value FROM responses WHERE key = ? AND version = ? AND expires > ?",
+            (key, version, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, version: str, value: Any) -> None:
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, version, value, expires) VALUES (?, ?, ?, ?)",
+                (key, version, json.dumps(value), time.time() + self.ttl),
+            )
+        # Trimming scans the table, so only every TRIM_INTERVAL writes. Entries of
+        # other versions are left alone: their keys never collide with this
+        # version's, and workers still serving them during a hot swap need them.
+        if next(self._writes) % self.TRIM_INTERVAL == 0:
+            self.trim()
+
+    def trim(self) -> None:
+        """Drop expired entries and the oldest ones beyond ``max_entries``."""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM responses")
+
+class ResponseCache:
+    """
+    Two-tier cache of recommendation responses and other JSON-serializable
+    per-request state, such as the queries behind result cursors.
+
+    The in-process tier is a TTL/size bounded LRU; the optional disk tier is
+    shared across workers. Entries are tied to the model version they were
+    computed with and only returned for that version. Nothing is cleared on
+    a version change: during a hot swap, requests of both versions are in
+    flight, and old entries age out through the TTL and the size bounds.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_SIZE,
+        ttl: float = RESPONSE_CACHE_TTL,
+        directory: Optional[str] = RESPONSE_CACHE_DIR,
+        disk_entries: int = RESPONSE_CACHE_DISK_SIZE,
+    ):
+        self._memory = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._disk: Optional[_DiskTier] = None
+        if directory:
+            try:
+                self._disk = _DiskTier(directory, disk_entries, ttl)
+                logger.info(f"Shared response cache at {self._disk.db_path}")
+            except Exception as e:
+                logger.error(f"Disabling shared response cache: {str(e)}")
+
+    def get(self, key: str, version: str) -> Optional[Any]:
+        """Return the cached response for the key, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        if self._disk is None:
+            return None
+
+        try:
+            value = self._disk.get(key, version)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared response cache lookup failed: {str(e)}")
+            return None
+        if value is not None:
+            with self._lock:
+                self._memory[key] = (version, value)
+        return value
+
+    def set(self, key: str, version: str, value: Any) -> None:
+        """Store a response in both tiers."""
+        with self._lock:
+            self._memory[key] = (version, value)
+        if self._disk is not None:
+            try:
+                self._disk.set(key, version, value)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared response cache write failed: {str(e)}")
+
+    def clear(self) -> None:
+        """Drop all cached responses."""
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+response_cache = ResponseCache()
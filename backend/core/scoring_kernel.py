@@ -0,0 +1,331 @@
+import argparse
+import logging
+import time
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+from pykeen.models import Model
+from pykeen.nn.modules import ComplExInteraction, DistMultInteraction, RotatEInteraction, TransEInteraction
+
+from .quantization import DEFAULT_CHUNK_SIZE, QuantizedTable, ReducedPrecisionModel
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Interactions with a specialized kernel implementation
+SUPPORTED_INTERACTIONS = {
+    DistMultInteraction: "distmult",
+    TransEInteraction: "transe",
+    ComplExInteraction: "complex",
+    RotatEInteraction: "rotate",
+}
+
+def _dequantize(rows: torch.Tensor, scale: Optional[torch.Tensor]) -> torch.Tensor:
+    rows = rows.to(torch.float32)
+    if scale is not None:
+        rows = rows * scale.unsqueeze(1)
+    return rows
+
+def _score_heads(
+    entity_data: torch.Tensor,
+    entity_scale: Optional[torch.Tensor],
+    relation_data: torch.Tensor,
+    relation_scale: Optional[torch.Tensor],
+    relation_ids: torch.Tensor,
+    tail_ids: torch.Tensor,
+    interaction: str,
+    p: float,
+    power_norm: bool,
+    sigmoid: bool,
+    start: int,
+    end: int,
+    chunk_size: int,
+) -> torch.Tensor:
+    """
+    Raw scores of the entities in [start, end) as heads for a batch of
+    (relation, tail) criteria, in a single chunked pass over the entity table.
+
+    Complex tables use the interleaved real/imaginary layout of QuantizedTable.
+
+    Returns:
+        Tensor of shape (num_criteria, end - start)
+    """
+    r = _dequantize(relation_data[relation_ids], None if relation_scale is None else relation_scale[relation_ids])
+    t = _dequantize(entity_data[tail_ids], None if entity_scale is None else entity_scale[tail_ids])
+
+    # Fold relation and tail into one query vector per criterion
+    if interaction == "distmult":
+        query = r * t
+    elif interaction == "transe":
+        query = t - r
+    else:
+        r_c = r.view(r.shape[0], -1, 2)
+        t_c = t.view(t.shape[0], -1, 2)
+        if interaction == "complex":
+            # Re(h * r * conj(t)) = h_re * z_re - h_im * z_im with z = r * conj(t)
+            z_re = r_c[..., 0] * t_c[..., 0] + r_c[..., 1] * t_c[..., 1]
+            z_im = r_c[..., 1] * t_c[..., 0] - r_c[..., 0] * t_c[..., 1]
+            query = torch.stack([z_re, -z_im], dim=-1).view(r.shape[0], -1)
+        else:
+            # |h * r - t| = |h - t * conj(r)| for unit-modulus rotations
+            q_re = t_c[..., 0] * r_c[..., 0] + t_c[..., 1] * r_c[..., 1]
+            q_im = t_c[..., 1] * r_c[..., 0] - t_c[..., 0] * r_c[..., 1]
+            query = torch.stack([q_re, q_im], dim=-1).view(r.shape[0], -1)
+
+    chunks: List[torch.Tensor] = []
+    for chunk_start in range(start, end, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, end)
+        h = _dequantize(
+            entity_data[chunk_start:chunk_end],
+            None if entity_scale is None else entity_scale[chunk_start:chunk_end],
+        )
+        if interaction == "distmult" or interaction == "complex":
+            chunks.append(torch.mm(query, h.t()))
+        elif interaction == "transe":
+            distance = torch.cdist(query, h, p=p)
+            if power_norm:
+                distance = distance.pow(p)
+            chunks.append(-distance)
+        else:
+            chunks.append(-torch.cdist(query, h, p=2.0))
+    scores = torch.cat(chunks, dim=1)
+    if sigmoid:
+        scores = torch.sigmoid(scores)
+    return scores
+
+def _score_recipes(
+    entity_data: torch.Tensor,
+    entity_scale: Optional[torch.Tensor],
+    relation_data: torch.Tensor,
+    relation_scale: Optional[torch.Tensor],
+    relation_ids: torch.Tensor,
+    tail_ids: torch.Tensor,
+    weights: torch.Tensor,
+    recipe_ids: torch.Tensor,
+    interaction: str,
+    p: float,
+    power_norm: bool,
+    sigmoid: bool,
+    chunk_size: int,
+) -> torch.Tensor:
+    """
+    Aggregated recipe scores for a batch of weighted (relation, tail) criteria.
+
+    Every criterion scores all entities as heads, is min-max normalized over
+    all entities and weighted; the weighted sum is returned for the recipe
+    entities only.
+    """
+    scores = _score_heads(
+        entity_data, entity_scale, relation_data, relation_scale, relation_ids, tail_ids,
+        interaction, p, power_norm, sigmoid, 0, entity_data.shape[0], chunk_size,
+    )
+    low = scores.amin(dim=1, keepdim=True)
+    span = scores.amax(dim=1, keepdim=True) - low
+    normalized = torch.where(span > 0, (scores - low) / span.clamp_min(1e-12), torch.zeros_like(scores))
+    return torch.mv(normalized[:, recipe_ids].t(), weights)
+
+try:
+    _compiled_score_heads = torch.jit.script(_score_heads)
+    _compiled_score_recipes = torch.jit.script(_score_recipes)
+except Exception as e:
+    logger.warning(f"TorchScript compilation of the scoring kernel failed, using eager mode: {str(e)}")
+    _compiled_score_heads = _score_heads
+    _compiled_score_recipes = _score_recipes
+
+def _normalize(raw: torch.Tensor, low: torch.Tensor, span: torch.Tensor) -> torch.Tensor:
+    """Min-max normalize raw scores with per-criterion bounds taken over all entities."""
+    low = low.unsqueeze(1)
+    span = span.unsqueeze(1)
+    return torch.where(span > 0, (raw - low) / span.clamp_min(1e-12), torch.zeros_like(raw))
+
+class CompiledScorer:
+    """
+    Specialized scorer for the loaded model's interaction.
+
+    Takes (relation ids, tail ids, weights) and returns aggregated scores for
+    all recipe entities, bypassing pykeen's generic prediction machinery.
+    """
+
+    def __init__(
+        self,
+        model: ReducedPrecisionModel,
+        recipe_ids: torch.LongTensor,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        interaction = SUPPORTED_INTERACTIONS.get(type(model.interaction))
+        if interaction is None:
+            raise ValueError(f"No compiled kernel for {type(model.interaction).__name__}")
+
+        self.interaction = interaction
+        self.p = float(getattr(model.interaction, "p", 2))
+        self.power_norm = bool(getattr(model.interaction, "power_norm", False))
+        self.sigmoid = bool(model.predict_with_sigmoid)
+        self.entities: QuantizedTable = model.entities
+        self.relations: QuantizedTable = model.relations
+        self.recipe_ids = recipe_ids
+        self.chunk_size = chunk_size
+        self.model_name = model.model_name
+
+    @classmethod
+    def from_model(
+        cls, model: Union[Model, ReducedPrecisionModel], recipe_ids: torch.LongTensor
+    ) -> "CompiledScorer":
+        """Build a scorer; full-precision models are wrapped without copying their embeddings."""
+        if not isinstance(model, ReducedPrecisionModel):
+            model = ReducedPrecisionModel(model, "float32")
+        return cls(model, recipe_ids)
+
+    def __call__(
+        self,
+        relation_ids: Sequence[int],
+        tail_ids: Sequence[int],
+        weights: Sequence[float],
+    ) -> torch.FloatTensor:
+        """
+        Score all recipes for the given criteria.
+
+        Returns:
+            Tensor of shape (num_recipes,) aligned with ``recipe_ids``
+        """
+        with torch.no_grad():
+            return _compiled_score_recipes(
+                self.entities.data,
+                self.entities.scale,
+                self.relations.data,
+                self.relations.scale,
+                torch.as_tensor(relation_ids, dtype=torch.long),
+                torch.as_tensor(tail_ids, dtype=torch.long),
+                torch.as_tensor(weights, dtype=torch.float32),
+                self.recipe_ids,
+                self.interaction,
+                self.p,
+                self.power_norm,
+                self.sigmoid,
+                self.chunk_size,
+            )
+
+    def score_heads(
+        self,
+        relation_ids: Sequence[int],
+        tail_ids: Sequence[int],
+        start: int,
+        end: int,
+    ) -> torch.FloatTensor:
+        """
+        Raw (unnormalized) scores of the entities in [start, end) as heads.
+
+        Returns:
+            Tensor of shape (num_criteria, end - start)
+        """
+        with torch.no_grad():
+            return _compiled_score_heads(
+                self.entities.data,
+                self.entities.scale,
+                self.relations.data,
+                self.relations.scale,
+                torch.as_tensor(relation_ids, dtype=torch.long),
+                torch.as_tensor(tail_ids, dtype=torch.long),
+                self.interaction,
+                self.p,
+                self.power_norm,
+                self.sigmoid,
+                start,
+                end,
+                self.chunk_size,
+            )
+
+    def topk(
+        self,
+        relation_ids: Sequence[int],
+        tail_ids: Sequence[int],
+        weights: Sequence[float],
+        k: int,
+        excluded: Optional[np.ndarray] = None,
+    ) -> Tuple[torch.LongTensor, torch.FloatTensor]:
+        """
+        Best-scoring recipes for the given criteria.
+
+        Recipes in the boolean ``excluded`` mask are dropped before selection.
+
+        Returns:
+            Recipe positions (indices into ``recipe_ids``) and their scores
+        """
+        scores = self(relation_ids, tail_ids, weights)
+        available = len(scores)
+        if excluded is not None:
+            scores = scores.masked_fill(torch.from_numpy(excluded), float("-inf"))
+            available -= int(excluded.sum())
+        top = torch.topk(scores, min(k, available))
+        return top.indices, top.values
+
+    def warm_up(self) -> None:
+        """Run the kernel once so the first request doesn't pay for TorchScript optimization."""
+        self([0], [0], [1.0])
+
+def build_compiled_scorer(
+    model: Union[Model, ReducedPrecisionModel], recipe_ids: torch.LongTensor
+) -> Optional[CompiledScorer]:
+    """Build and warm up a compiled scorer, or return None if the model isn't supported."""
+    try:
+        scorer = CompiledScorer.from_model(model, recipe_ids)
+        scorer.warm_up()
+    except Exception as e:
+        logger.warning(f"Compiled scoring unavailable, using generic prediction path: {str(e)}")
+        return None
+
+    logger.info(f"Compiled {scorer.interaction} scoring kernel for {scorer.model_name}")
+    return scorer
+
+def _time(fn, repeats: int) -> float:
+    """Mean wall time of ``fn`` in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+def main() -> None:
+    """Benchmark the compiled scoring kernel against the generic prediction path."""
+    from .model_manager import model_manager
+    from .quantization import sample_queries
+    from .recommender import _rank_recipes_generic, _rank_recipes_compiled
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--queries", type=int, default=20, help="Number of sampled queries")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per query and path")
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    model, labels = model_manager.get_model_and_labels()
+    scorer = model_manager.get_scorer()
+    if scorer is None:
+        raise SystemExit(f"No compiled kernel available for {type(model).__name__}")
+
+    entities = labels.entity_id_to_label
+    relations = labels.relation_id_to_label
+    generic_ms, compiled_ms, agreement = [], [], []
+    for query in sample_queries(labels, args.queries):
+        criteria: List[Tuple[str, str, float]] = [(entities[t], relations[r], w) for r, t, w in query]
+        generic, _ = _rank_recipes_generic(model, labels, scorer.recipe_ids, criteria, args.top_k, False)
+        compiled, _ = _rank_recipes_compiled(scorer, labels, criteria, args.top_k)
+        agreement.append(len(set(generic) & set(compiled)) / max(len(generic), 1))
+        generic_ms.append(_time(
+            lambda: _rank_recipes_generic(model, labels, scorer.recipe_ids, criteria, args.top_k, False), args.repeats
+        ))
+        compiled_ms.append(_time(
+            lambda: _rank_recipes_compiled(scorer, labels, criteria, args.top_k), args.repeats
+        ))
+
+    generic_mean = sum(generic_ms) / len(generic_ms)
+    compiled_mean = sum(compiled_ms) / len(compiled_ms)
+    print(f"model:          {scorer.model_name} ({scorer.interaction}, {scorer.entities.precision})")
+    print(f"entities:       {len(scorer.entities)}")
+    print(f"queries:        {len(generic_ms)}")
+    print(f"generic path:   {generic_mean:.2f}ms/query")
+    print(f"compiled path:  {compiled_mean:.2f}ms/query")
+    print(f"speedup:        {generic_mean / compiled_mean:.1f}x")
+    print(f"top-k overlap:  {sum(agreement) / len(agreement):.3f}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main()
@@ -0,0 +1,179 @@
+import argparse
+import bisect
+import logging
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pykeen.triples import TriplesFactory
+
+from .recipe_filters import attribute_triples
+from .utils import get_triples_factory, SERVING_LABELS_PATH, TRIPLES_PATH
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def triples_signature(path: Path = TRIPLES_PATH) -> str:
+    """Identify the triples file a serving artifact was exported from."""
+    stat = path.stat()
+    return f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+class _IdToLabel(Sequence):
+    """Labels by id, stored as one UTF-8 buffer plus offsets."""
+
+    def __init__(self, buffer: np.ndarray, offsets: np.ndarray):
+        self._buffer = buffer
+        self._offsets = offsets
+
+    @classmethod
+    def from_labels(cls, labels: List[str]) -> "_IdToLabel":
+        encoded = [label.encode("utf-8") for label in labels]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return self._buffer[self._offsets[idx]:self._offsets[idx + 1]].tobytes().decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return self._buffer.nbytes + self._offsets.nbytes
+
+class _LabelToId(Mapping):
+    """Label to id lookup by binary search over the ids in label order."""
+
+    def __init__(self, labels: _IdToLabel, order: np.ndarray):
+        self._labels = labels
+        self._order = order
+
+    def _position(self, label: str) -> int:
+        return bisect.bisect_left(range(len(self._order)), label, key=lambda i: self._labels[int(self._order[i])])
+
+    def __getitem__(self, label: str) -> int:
+        position = self._position(label)
+        if position < len(self._order):
+            idx = int(self._order[position])
+            if self._labels[idx] == label:
+                return idx
+        raise KeyError(label)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._labels)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        return ((label, idx) for idx, label in enumerate(self._labels))
+
+class LabelIndex:
+    """
+    Compact label/id mappings of the served model.
+
+    Replaces the TriplesFactory at serve time: entity labels live in a single
+    buffer with offsets, looked up by binary search, and the graph itself is
+    reduced to the distinct (relation, tail) criteria pairs. Exposes the
+    ``entity_to_id``/``entity_id_to_label``/``relation_to_id``/
+    ``relation_id_to_label`` lookups of a TriplesFactory.
+    """
+
+    def __init__(
+        self,
+        entity_buffer: np.ndarray,
+        entity_offsets: np.ndarray,
+        entity_order: np.ndarray,
+        relation_labels: List[str],
+        pairs: np.ndarray,
+    ):
+        self.entity_id_to_label = _IdToLabel(entity_buffer, entity_offsets)
+        self.entity_to_id = _LabelToId(self.entity_id_to_label, entity_order)
+        self.relation_id_to_label = list(relation_labels)
+        self.relation_to_id = {label: idx for idx, label in enumerate(self.relation_id_to_label)}
+        # Distinct (relation id, tail id) pairs of the graph, sorted
+        self.pairs = pairs
+
+    @property
+    def num_entities(self) -> int:
+        return len(self.entity_id_to_label)
+
+    @property
+    def num_relations(self) -> int:
+        return len(self.relation_id_to_label)
+
+    @property
+    def nbytes(self) -> int:
+        return self.entity_id_to_label.nbytes + self.entity_to_id._order.nbytes + self.pairs.nbytes
+
+    @classmethod
+    def from_triples_factory(cls, triples_factory: TriplesFactory) -> "LabelIndex":
+        entity_labels = [triples_factory.entity_id_to_label[i] for i in range(triples_factory.num_entities)]
+        entities = _IdToLabel.from_labels(entity_labels)
+        order = np.array(sorted(range(len(entity_labels)), key=entity_labels.__getitem__), dtype=np.int64)
+        pairs = np.unique(triples_factory.mapped_triples[:, 1:].numpy(), axis=0).astype(np.int32)
+        relation_labels = [triples_factory.relation_id_to_label[i] for i in range(triples_factory.num_relations)]
+        return cls(entities._buffer, entities._offsets, order, relation_labels, pairs)
+
+def export_serving_artifact(triples_factory: TriplesFactory, path: Path = SERVING_LABELS_PATH) -> None:
+    """Write the label index and attribute triples the serving process needs."""
+    labels = LabelIndex.from_triples_factory(triples_factory)
+    np.savez(
+        path,
+        source=np.array(triples_signature()),
+        entity_buffer=labels.entity_id_to_label._buffer,
+        entity_offsets=labels.entity_id_to_label._offsets,
+        entity_order=labels.entity_to_id._order,
+        relation_labels=np.array(labels.relation_id_to_label),
+        pairs=labels.pairs,
+        attribute_triples=attribute_triples(triples_factory),
+    )
+
+def load_serving_labels(path: Path = SERVING_LABELS_PATH) -> Tuple[LabelIndex, np.ndarray]:
+    """
+    Load the label index and attribute triples for serving.
+
+    Uses the exported artifact if it matches the triples file on disk and
+    otherwise builds both from the triples; the TriplesFactory is discarded
+    either way.
+    """
+    if path.exists():
+        with np.load(path) as artifact:
+            if str(artifact["source"]) == triples_signature():
+                logger.info(f"Loading serving labels from {path}")
+                labels = LabelIndex(
+                    artifact["entity_buffer"],
+                    artifact["entity_offsets"],
+                    artifact["entity_order"],
+                    artifact["relation_labels"].tolist(),
+                    artifact["pairs"],
+                )
+                return labels, artifact["attribute_triples"]
+        logger.warning(f"Serving labels at {path} are stale, rebuilding from the triples")
+
+    triples_factory = get_triples_factory()
+    return LabelIndex.from_triples_factory(triples_factory), attribute_triples(triples_factory)
+
+def main() -> None:
+    """Export the serving label artifact for the triples file on disk."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--output", type=Path, default=SERVING_LABELS_PATH)
+    args = parser.parse_args()
+
+    triples_factory = get_triples_factory()
+    export_serving_artifact(triples_factory, args.output)
+    labels, triples = load_serving_labels(args.output)
+    print(f"entities:   {labels.num_entities}")
+    print(f"relations:  {labels.num_relations}")
+    print(f"criteria:   {len(labels.pairs)}")
+    print(f"triples:    {len(triples)} (attribute index)")
+    print(f"size:       {args.output.stat().st_size / (1024 * 1024):.2f}MB")
+    print(f"output:     {args.output}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main()
@@ -0,0 +1,264 @@
+import argparse
+import logging
+import threading
+import time
+import weakref
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from .scoring_kernel import CompiledScorer, _normalize
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _worker_main(scorer: CompiledScorer, start: int, end: int, recipe_start: int, recipe_end: int, conn) -> None:
+    """
+    Scoring loop of one shard worker.
+
+    The worker owns the entities [start, end) and the recipe positions
+    [recipe_start, recipe_end) among them. A request takes two round trips:
+    "bounds" scores the shard and returns per-criterion min/max, "topk"
+    normalizes with the global bounds and returns the shard's best recipes.
+    """
+    # One thread per worker: the pool itself provides the parallelism
+    torch.set_num_threads(1)
+    local_recipes = scorer.recipe_ids[recipe_start:recipe_end] - start
+    raw: Optional[torch.Tensor] = None
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        command = message[0]
+        if command == "stop":
+            break
+
+        try:
+            with torch.no_grad():
+                if command == "bounds":
+                    _, relation_ids, tail_ids = message
+                    raw = scorer.score_heads(relation_ids, tail_ids, start, end)
+                    conn.send((raw.amin(dim=1), raw.amax(dim=1)))
+                elif command == "topk":
+                    _, low, span, weights, k, excluded = message
+                    normalized = _normalize(raw[:, local_recipes], low, span)
+                    scores = torch.mv(normalized.t(), torch.as_tensor(weights, dtype=torch.float32))
+                    available = len(scores)
+                    if excluded is not None:
+                        scores = scores.masked_fill(torch.from_numpy(excluded), float("-inf"))
+                        available -= int(excluded.sum())
+                    top = torch.topk(scores, min(k, available))
+                    raw = None
+                    conn.send((top.indices + recipe_start, top.values))
+                else:
+                    raise ValueError(f"Unknown command {command}")
+        except Exception as e:
+            raw = None
+            conn.send(e)
+
+def _shutdown(processes: List, connections: List) -> None:
+    """Stop the worker processes of a pool."""
+    for conn in connections:
+        try:
+            conn.send(("stop",))
+        except (OSError, ValueError):
+            pass
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    for conn in connections:
+        conn.close()
+
+class ShardedScorer:
+    """
+    Compiled scorer split across a pool of worker processes.
+
+    The entity table is partitioned into contiguous shards, one per worker;
+    the embeddings are moved to shared memory so workers attach to them
+    instead of holding copies. Each worker scores its shard, the coordinator
+    reduces the per-criterion normalization bounds over all shards, and the
+    workers' local top-k lists are merged into the final ranking.
+
+    Exposes the same ``topk`` interface as CompiledScorer. If the pool breaks,
+    scoring falls back to the wrapped scorer in the serving process.
+    """
+
+    def __init__(self, scorer: CompiledScorer, num_workers: int):
+        self._local = scorer
+        self.recipe_ids = scorer.recipe_ids
+        self.entities = scorer.entities
+        self.interaction = scorer.interaction
+        self.model_name = scorer.model_name
+        self._lock = threading.Lock()
+
+        for table in (scorer.entities, scorer.relations):
+            table.data.share_memory_()
+            if table.scale is not None:
+                table.scale.share_memory_()
+        scorer.recipe_ids.share_memory_()
+
+        num_entities = len(scorer.entities)
+        num_workers = max(1, min(num_workers, num_entities))
+        bounds = np.linspace(0, num_entities, num_workers + 1).astype(np.int64)
+        recipe_bounds = np.searchsorted(scorer.recipe_ids.numpy(), bounds)
+        self._recipe_bounds = recipe_bounds.tolist()
+        self.shards: List[Tuple[int, int]] = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+        # Spawn rather than fork: the serving process may already run torch thread pools
+        context = mp.get_context("spawn")
+        self._processes = []
+        self._connections = []
+        for i, (start, end) in enumerate(self.shards):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(scorer, start, end, self._recipe_bounds[i], self._recipe_bounds[i + 1], child_conn),
+                name=f"scoring-shard-{i}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._processes.append(process)
+            self._connections.append(parent_conn)
+        self._finalizer = weakref.finalize(self, _shutdown, self._processes, self._connections)
+        self._broken = False
+
+    @property
+    def num_workers(self) -> int:
+        return 0 if self._broken else len(self._processes)
+
+    def _broadcast(self, messages: List[tuple]) -> List:
+        """Send one message per worker and collect the replies in shard order."""
+        for conn, message in zip(self._connections, messages):
+            conn.send(message)
+        replies = [conn.recv() for conn in self._connections]
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
+        return replies
+
+    def _sharded_topk(
+        self,
+        relation_ids: Sequence[int],
+        tail_ids: Sequence[int],
+        weights: Sequence[float],
+        k: int,
+        excluded: Optional[np.ndarray],
+    ) -> Tuple[torch.LongTensor, torch.FloatTensor]:
+        relation_ids = list(relation_ids)
+        tail_ids = list(tail_ids)
+        bounds = self._broadcast([("bounds", relation_ids, tail_ids)] * len(self._connections))
+        low = torch.stack([b[0] for b in bounds]).amin(dim=0)
+        span = torch.stack([b[1] for b in bounds]).amax(dim=0) - low
+
+        messages = []
+        for i in range(len(self.shards)):
+            shard_excluded = None
+            if excluded is not None:
+                shard_excluded = excluded[self._recipe_bounds[i]:self._recipe_bounds[i + 1]]
+            messages.append(("topk", low, span, list(weights), k, shard_excluded))
+        partial = self._broadcast(messages)
+
+        positions = torch.cat([p[0] for p in partial])
+        scores = torch.cat([p[1] for p in partial])
+        top = torch.topk(scores, min(k, len(scores)))
+        return positions[top.indices], top.values
+
+    def topk(
+        self,
+        relation_ids: Sequence[int],
+        tail_ids: Sequence[int],
+        weights: Sequence[float],
+        k: int,
+        excluded: Optional[np.ndarray] = None,
+    ) -> Tuple[torch.LongTensor, torch.FloatTensor]:
+        """
+        Best-scoring recipes for the given criteria.
+
+        Returns:
+            Recipe positions (indices into ``recipe_ids``) and their scores
+        """
+        if not self._broken:
+            # Workers keep per-request state between the two phases
+            with self._lock:
+                try:
+                    return self._sharded_topk(relation_ids, tail_ids, weights, k, excluded)
+                except (EOFError, OSError) as e:
+                    logger.error(f"Scoring worker pool failed, scoring in-process from now on: {str(e)}")
+                    self._broken = True
+                    self._finalizer()
+        return self._local.topk(relation_ids, tail_ids, weights, k, excluded)
+
+    def warm_up(self) -> None:
+        """Wait for all workers to start and compile their kernels."""
+        self.topk([0], [0], [1.0], 1)
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self._finalizer()
+
+def build_sharded_scorer(scorer: CompiledScorer, num_workers: int) -> Optional[ShardedScorer]:
+    """Start and warm up a worker pool for the scorer, or return None if that fails."""
+    try:
+        sharded = ShardedScorer(scorer, num_workers)
+        sharded.warm_up()
+    except Exception as e:
+        logger.warning(f"Sharded scoring unavailable, scoring in-process: {str(e)}")
+        return None
+
+    logger.info(f"Started {sharded.num_workers} scoring workers over {len(scorer.entities)} entities")
+    return sharded
+
+def main() -> None:
+    """Compare in-process and sharded latency of the compiled scorer on the served model."""
+    from .model_manager import model_manager
+    from .quantization import sample_queries
+
+    parser = argparse.ArgumentParser(description="Benchmark sharded scoring against in-process scoring.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=1000)
+    args = parser.parse_args()
+
+    handle = model_manager.get_handle()
+    scorer = handle.scorer
+    if isinstance(scorer, ShardedScorer):
+        scorer = scorer._local
+    if scorer is None:
+        raise SystemExit(f"No compiled kernel available for {type(handle.model).__name__}")
+    queries = [
+        ([r for r, _, _ in q], [t for _, t, _ in q], [w for _, _, w in q])
+        for q in sample_queries(handle.labels, args.queries)
+    ]
+
+    def run(target) -> Tuple[float, List[set]]:
+        results = [set(target.topk(*q, args.top_k)[0].tolist()) for q in queries]
+        started = time.perf_counter()
+        for _ in range(args.repeats):
+            for q in queries:
+                target.topk(*q, args.top_k)
+        return (time.perf_counter() - started) * 1000 / (args.repeats * len(queries)), results
+
+    baseline_ms, expected = run(scorer)
+    print(f"entities:       {len(scorer.entities)}")
+    print(f"in-process:     {baseline_ms:.2f}ms/query ({torch.get_num_threads()} threads)")
+    for num_workers in args.workers:
+        sharded = ShardedScorer(scorer, num_workers)
+        sharded.warm_up()
+        sharded_ms, results = run(sharded)
+        sharded.close()
+        overlap = np.mean([len(a & b) / max(len(a), 1) for a, b in zip(expected, results)])
+        print(
+            f"{num_workers} workers:{' ' * (6 - len(str(num_workers)))}{sharded_ms:.2f}ms/query, "
+            f"speedup {baseline_ms / sharded_ms:.2f}x, top-k overlap {overlap:.3f}"
+        )
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    main()
@@ -1,5 +1,6 @@
 import os
 import ast
+import hashlib
 import torch
 import pandas as pd
 import numpy as np
@@ -22,6 +23,54 @@ UNKNOWN_PLACEHOLDER = "unknown"
 BASE_DIR = Path(__file__).resolve().parent  
 MODEL_PATH = BASE_DIR / "embedding" / "trained_model.pkl"
 TRIPLES_PATH = BASE_DIR / "data" / "triples_new_without_ct_ss.csv"
+# Compact label index exported from the triples for serving (see core.serving_artifact)
+SERVING_LABELS_PATH = BASE_DIR / "embedding" / "serving_labels.npz"
+
+# Serving configuration
+# float32 keeps the trained model as is; float16/int8 serve from reduced-precision embeddings.
+SERVING_PRECISION = os.environ.get("KGE_SERVING_PRECISION", "float32")
+# Reduced precision is rejected at load time if its mean top-k overlap with float32 falls below this.
+PRECISION_MIN_OVERLAP = float(os.environ.get("KGE_PRECISION_MIN_OVERLAP", "0.9"))
+# Score supported interactions with the TorchScript kernel instead of pykeen's predict_target.
+COMPILED_SCORING = os.environ.get("KGE_COMPILED_SCORING", "true").lower() == "true"
+# Split compiled scoring across this many worker processes; 0 or 1 scores in the serving process.
+SHARDED_SCORING_WORKERS = int(os.environ.get("KGE_SHARDED_SCORING_WORKERS", "0"))
+# Precomputed criterion x recipe score matrices, one subdirectory per model version
+# (see core.materialize). Used in place of the model when present.
+MATERIALIZED_SCORES_DIR = os.environ.get("KGE_MATERIALIZED_DIR", str(BASE_DIR / "materialized"))
+
+# Response cache configuration
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+# Directory of the shared on-disk cache tier; unset disables it.
+RESPONSE_CACHE_DIR = os.environ.get("RESPONSE_CACHE_DIR")
+RESPONSE_CACHE_DISK_SIZE = int(os.environ.get("RESPONSE_CACHE_DISK_SIZE", "100000"))
+
+# Rankings stored behind /recommend cursors for deep pagination
+RANKING_DEPTH = int(os.environ.get("RANKING_DEPTH", "1000"))
+# /recommend first ranks this many times top_k deep; a cursor is ranked
+# RANKING_DEPTH deep only once /recommend/page is called with it.
+RANKING_INITIAL_DEPTH_FACTOR = int(os.environ.get("RANKING_INITIAL_DEPTH_FACTOR", "5"))
+RANKING_STORE_TTL = float(os.environ.get("RANKING_STORE_TTL", "900"))
+RANKING_STORE_MAX_BYTES = int(os.environ.get("RANKING_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Admission control of scoring requests (see core.admission); costs are criteria counts.
+# A max in-flight cost of 0 disables admission control.
+ADMISSION_MAX_INFLIGHT_COST = int(os.environ.get("ADMISSION_MAX_INFLIGHT_COST", "16"))
+ADMISSION_MAX_QUEUED_COST = int(os.environ.get("ADMISSION_MAX_QUEUED_COST", "64"))
+# Seconds a request may wait for capacity before it is shed, and the Retry-After sent then
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "5"))
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", "2"))
+
+# Fall back to fuzzy matching for request values that don't match the vocabulary exactly
+VOCABULARY_FUZZY_MATCHING = os.environ.get("VOCABULARY_FUZZY_MATCHING", "false").lower() == "true"
+VOCABULARY_FUZZY_CUTOFF = float(os.environ.get("VOCABULARY_FUZZY_CUTOFF", "0.85"))
+
+# Directory for the disk-backed long text fields of the recipe store; unset uses the system temp dir.
+RECIPE_TEXT_DIR = os.environ.get("RECIPE_TEXT_DIR")
+
+# Token required in the X-Admin-Token header of /admin endpoints; unset disables them.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
 
 def tuple_to_canonical(s: str) -> str:
     """
@@ -80,6 +129,19 @@ def get_triples_factory() -> TriplesFactory:
         logger.error(f"Failed to create triples factory: {str(e)}")
         raise
 
+def artifact_version() -> str:
+    """
+    Identify the model/dataset version currently on disk.
+
+    Derived from the size and modification time of the model and triples
+    files plus the serving precision, so it changes whenever either is replaced.
+    """
+    digest = hashlib.sha256(SERVING_PRECISION.encode())
+    for path in (MODEL_PATH, TRIPLES_PATH):
+        stat = path.stat()
+        digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:12]
+
 def map_health_attribute(element: str) -> str:
     """Map health attribute string to a relation name."""
     e = element.lower()
@@ -107,21 +169,3 @@ def map_health_attribute(element: str) -> str:
 def split_and_clean(value: str, delimiter: str) -> List[str]:
     """Split string by delimiter and return non-empty trimmed values."""
     return [v.strip() for v in value.split(delimiter) if v.strip()]
-
-# Lazy loading of model and triples factory
-_model = None
-_triples_factory = None
-
-def get_model():
-    """Get KGE model with lazy loading."""
-    global _model
-    if _model is None:
-        _model = load_kge_model().eval()
-    return _model
-
-def get_triples():
-    """Get triples factory with lazy loading."""
-    global _triples_factory
-    if _triples_factory is None:
-        _triples_factory = get_triples_factory()
-    return _triples_factory
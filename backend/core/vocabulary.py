@@ -0,0 +1,113 @@
+import difflib
+import logging
+from typing import Dict, List, Optional
+
+from .serving_artifact import LabelIndex
+from .utils import VOCABULARY_FUZZY_MATCHING, VOCABULARY_FUZZY_CUTOFF
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Attribute types and the entity label prefix of their graph nodes
+ATTRIBUTE_PREFIXES = {
+    "cooking_method": "cooking_method_",
+    "cuisine_region": "cuisine_region_",
+    "diet_type": "diet_type_",
+    "meal_type": "meal_type_",
+    "health_attribute": "health_attribute_",
+    "ingredient": "ingredient_",
+}
+
+# Unknown values that get suggestions, and that are listed in an error, at most;
+# fuzzy matching scans the whole vocabulary for each of them
+SUGGEST_MAX_VALUES = 5
+ERROR_MAX_VALUES = 20
+# Longer unknown values are cut in error messages
+ERROR_MAX_VALUE_LENGTH = 50
+
+def normalize_value(value: str) -> str:
+    """Case- and whitespace-insensitive form of a criterion value."""
+    return " ".join(value.split()).casefold()
+
+class UnknownCriteriaError(ValueError):
+    """
+    Raised when request values don't match any entity of the graph.
+
+    ``unknown`` holds all unknown values; the message lists the first
+    ``ERROR_MAX_VALUES`` of them and counts the rest.
+    """
+
+    def __init__(self, unknown: Dict[str, List[str]], suggestions: Dict[str, List[str]]):
+        self.unknown = unknown
+        self.suggestions = suggestions
+        values = [(attribute_type, value) for attribute_type, values in unknown.items() for value in values]
+        parts = []
+        for attribute_type, value in values[:ERROR_MAX_VALUES]:
+            hint = suggestions.get(value)
+            if len(value) > ERROR_MAX_VALUE_LENGTH:
+                value = value[:ERROR_MAX_VALUE_LENGTH] + "..."
+            parts.append(
+                f"{attribute_type} '{value}'" + (f" (did you mean {', '.join(repr(s) for s in hint)}?)" if hint else "")
+            )
+        if len(values) > ERROR_MAX_VALUES:
+            parts.append(f"and {len(values) - ERROR_MAX_VALUES} more")
+        super().__init__(f"Unknown values: {'; '.join(parts)}")
+
+class VocabularyIndex:
+    """
+    Criteria vocabulary built from the entity labels of the graph.
+
+    Resolves request values to entity labels per attribute type, ignoring
+    case and whitespace differences, optionally falling back to fuzzy matching.
+    """
+
+    def __init__(self, labels: LabelIndex):
+        self._labels: Dict[str, Dict[str, str]] = {attribute_type: {} for attribute_type in ATTRIBUTE_PREFIXES}
+        self._values: Dict[str, List[str]] = {}
+
+        for label in labels.entity_id_to_label:
+            for attribute_type, prefix in ATTRIBUTE_PREFIXES.items():
+                if label.startswith(prefix):
+                    key = normalize_value(label[len(prefix):])
+                    if key in self._labels[attribute_type]:
+                        logger.warning(f"Duplicate {attribute_type} value '{key}', keeping {self._labels[attribute_type][key]}")
+                    else:
+                        self._labels[attribute_type][key] = label
+                    break
+
+        for attribute_type, labels in self._labels.items():
+            prefix = ATTRIBUTE_PREFIXES[attribute_type]
+            self._values[attribute_type] = sorted(label[len(prefix):] for label in labels.values())
+
+        logger.info(
+            "Built vocabulary: " + ", ".join(f"{len(v)} {k}" for k, v in self._values.items())
+        )
+
+    def attribute_types(self) -> List[str]:
+        return list(ATTRIBUTE_PREFIXES)
+
+    def values(self, attribute_type: str) -> List[str]:
+        """Sorted values of an attribute type, as they appear in the graph."""
+        return self._values[attribute_type]
+
+    def resolve(self, attribute_type: str, value: str, fuzzy: bool = VOCABULARY_FUZZY_MATCHING) -> Optional[str]:
+        """Resolve a request value to its entity label, or None if unknown."""
+        labels = self._labels[attribute_type]
+        key = normalize_value(value)
+        label = labels.get(key)
+        if label is None and fuzzy:
+            matches = difflib.get_close_matches(key, labels.keys(), n=1, cutoff=VOCABULARY_FUZZY_CUTOFF)
+            if matches:
+                label = labels[matches[0]]
+                logger.info(f"Fuzzy-matched {attribute_type} '{value}' to {label}")
+        return label
+
+    def value_of(self, attribute_type: str, label: str) -> str:
+        """Strip the attribute prefix from an entity label."""
+        return label[len(ATTRIBUTE_PREFIXES[attribute_type]):]
+
+    def suggest(self, attribute_type: str, value: str, n: int = 3) -> List[str]:
+        """Closest known values for an unknown one."""
+        labels = self._labels[attribute_type]
+        matches = difflib.get_close_matches(normalize_value(value), labels.keys(), n=n, cutoff=0.6)
+        return [self.value_of(attribute_type, labels[match]) for match in matches]
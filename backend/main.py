@@ -5,7 +5,7 @@ from contextlib import asynccontextmanager
 import torch
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import recipe_info, recommend, unique_items
+from routers import admin, recipe_info, recommend, unique_items, vocabulary
 
 # Configure logging
 logging.basicConfig(
@@ -15,6 +15,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Import for model preloading
+from core.admission import AdmissionMiddleware, admission_controller
 from core.memory_utils import log_memory_usage
 from core.model_manager import model_manager
 
@@ -25,7 +26,7 @@ async def lifespan(app: FastAPI):
     try:
         logger.info("Preloading model and triples during startup...")
         # Preload model and triples by accessing them once
-        model_manager.get_model_and_triples()
+        model_manager.get_model_and_labels()
         logger.info("Model and triples preloaded successfully")
         log_memory_usage("after_preload")
     except Exception as e:
@@ -48,18 +49,24 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Added before CORS so that shed responses still carry CORS headers
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # For development only – restrict in production
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Model-Version", "X-Result-Cursor", "X-Query-Plan", "Retry-After"],
 )
 
 # Include routers WITHOUT the prefix to match the frontend's expectations
 app.include_router(recommend.router, tags=["recommendations"])
 app.include_router(unique_items.router, tags=["ingredients"])
 app.include_router(recipe_info.router, tags=["recipes"])
+app.include_router(vocabulary.router, tags=["vocabulary"])
+app.include_router(admin.router, tags=["admin"])
 
 
 @app.get("/", tags=["health"])
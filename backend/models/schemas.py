@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional, Dict, Any
 
 class WeightConfig(BaseModel):
@@ -10,6 +10,17 @@ class WeightConfig(BaseModel):
     ingredients: float = Field(1.0, description="Weight for ingredients")
     healthy_type: float = Field(1.0, description="Weight for health attributes")
 
+class NutritionRange(BaseModel):
+    """Inclusive bounds on a nutrition value; either side may be omitted"""
+    min: Optional[float] = Field(None, description="Lowest accepted value")
+    max: Optional[float] = Field(None, description="Highest accepted value")
+
+    @model_validator(mode="after")
+    def check_bounds(self) -> "NutritionRange":
+        if self.min is not None and self.max is not None and self.min > self.max:
+            raise ValueError("min must not be greater than max")
+        return self
+
 class RecommendationRequest(BaseModel):
     """Request model for recipe recommendations"""
     cooking_method: Optional[str] = None
@@ -21,6 +32,12 @@ class RecommendationRequest(BaseModel):
     weights: Dict[str, float] = {}
     top_k: int = Field(5, ge=1, le=50)
     flexible: bool = False
+    exclude_ingredients: List[str] = Field([], description="Ingredients recipes must not contain")
+    exclude_diet_types: List[str] = Field([], description="Diet types recipes must not have")
+    exclude_cuisine_regions: List[str] = Field([], description="Cuisine regions recipes must not belong to")
+    nutrition: Dict[str, NutritionRange] = Field(
+        {}, description="Nutrition ranges keyed by RecipeInfo column, e.g. Calories or SodiumContent"
+    )
 
     # Updated config style for Pydantic V2
     model_config = {
@@ -39,7 +56,9 @@ class RecommendationRequest(BaseModel):
                     "ingredients": 1.5
                 },
                 "top_k": 5,
-                "flexible": True
+                "flexible": True,
+                "exclude_ingredients": ["peanut", "shrimp"],
+                "nutrition": {"Calories": {"min": 200, "max": 600}, "SodiumContent": {"max": 800}}
             }
         }
     }
@@ -65,4 +84,14 @@ class RecipeInfo(BaseModel):
     CholesterolContent: Optional[float] = None
     SodiumContent: Optional[float] = None
     SugarContent: Optional[float] = None
-    FiberContent: Optional[float] = None
\ No newline at end of file
+    FiberContent: Optional[float] = None
+
+class RecommendationPage(BaseModel):
+    """Page of a stored recommendation ranking"""
+    cursor: str
+    model_version: str
+    offset: int
+    total: int
+    recipe_ids: List[str]
+    scores: List[float]
+    next_offset: Optional[int] = None
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Header, HTTPException
+from typing import Dict, Any, Optional
+import hmac
+import logging
+
+from core.admission import admission_controller
+from core.model_manager import model_manager
+from core.utils import ADMIN_TOKEN
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"]
+)
+
+def _check_token(token: Optional[str]) -> None:
+    """Reject the request unless an admin token is configured and matches."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ADMIN_TOKEN to enable them")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("/model", response_model=Dict[str, Any])
+async def get_model_status(x_admin_token: Optional[str] = Header(None)):
+    """
+    Get the served model version and the state of background reloads.
+    """
+    _check_token(x_admin_token)
+    return model_manager.status()
+
+@router.get("/admission", response_model=Dict[str, Any])
+async def get_admission_status(x_admin_token: Optional[str] = Header(None)):
+    """
+    Get the scoring work in flight and queued, and how many requests were shed.
+    """
+    _check_token(x_admin_token)
+    return admission_controller.status()
+
+@router.post("/reload", response_model=Dict[str, Any], status_code=202)
+async def reload_model(force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """
+    Load the model and dataset currently on disk in the background and swap
+    them in once warmed up. Requests keep being served by the current version
+    until then.
+    """
+    _check_token(x_admin_token)
+    if not model_manager.reload(force=force):
+        raise HTTPException(status_code=409, detail="A model reload is already in progress")
+
+    logger.info(f"Model reload started (force={force})")
+    return model_manager.status()
@@ -1,10 +1,24 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional, Tuple
+import json
 import logging
 
-from models.schemas import RecommendationRequest
-from core.recommender import map_user_input_to_criteria, get_matching_recipes
+from models.schemas import RecommendationRequest, RecommendationPage
+from core.recommender import (
+    map_user_input_to_criteria,
+    map_user_input_to_exclusions,
+    map_user_input_to_ranges,
+    rank_recipes,
+)
+from core.admission import admission_controller
 from core.memory_utils import log_memory_usage, clean_memory
+from core.model_manager import model_manager, ModelHandle
+from core.query_planner import plan_query, QueryPlan, EXPLAIN_MAX_CRITERIA
+from core.response_cache import response_cache, canonical_request_key
+from core.ranking_store import ranking_store, RankingQuery, StoredRanking
+from core.vocabulary import UnknownCriteriaError
+from core.utils import RANKING_DEPTH, RANKING_INITIAL_DEPTH_FACTOR
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -14,12 +28,109 @@ router = APIRouter(
     tags=["recommendations"]
 )
 
+def _map_request(
+    request: RecommendationRequest, handle: ModelHandle
+) -> Tuple[
+    List[Tuple[str, str, float]],
+    List[Tuple[str, str]],
+    List[Tuple[str, Optional[float], Optional[float]]],
+]:
+    """Map a request to its criteria, exclusions and nutrition ranges."""
+    criteria = map_user_input_to_criteria(
+        cooking_method=request.cooking_method,
+        diet_types=request.diet_types,
+        meal_type=request.meal_type,
+        health_types=request.health_types,
+        cuisine_region=request.cuisine_region,
+        ingredients=request.ingredients,
+        weights=request.weights,
+        vocabulary=handle.vocabulary,
+    )
+    exclusions = map_user_input_to_exclusions(
+        ingredients=request.exclude_ingredients,
+        diet_types=request.exclude_diet_types,
+        cuisine_regions=request.exclude_cuisine_regions,
+        vocabulary=handle.vocabulary,
+    )
+    ranges = map_user_input_to_ranges(request.nutrition, handle.nutrition)
+    return criteria, exclusions, ranges
+
+def _query_key(cursor: str) -> str:
+    """Response cache key of the query behind a cursor."""
+    return f"query:{cursor}"
+
+def _share_query(cursor: str, version: str, query: RankingQuery) -> None:
+    """
+    Keep the query behind a cursor in the response cache, so any worker
+    process can rank the cursor when it is paged, for as long as the
+    response it came with is cached.
+    """
+    response_cache.set(_query_key(cursor), version, query.to_dict())
+
+def _cursor_query(cursor: str, handle: ModelHandle, ranking: Optional[StoredRanking]) -> Optional[RankingQuery]:
+    """Query of a cursor of the current model version, or None if it is unknown."""
+    if ranking is not None and ranking.version == handle.version:
+        return ranking.query
+    shared = response_cache.get(_query_key(cursor), handle.version)
+    return RankingQuery.from_dict(shared) if shared is not None else None
+
+async def _rank_admitted(cursor: str, handle: ModelHandle, query: RankingQuery) -> StoredRanking:
+    """
+    Rank a paged cursor to the full depth under admission control.
+
+    The middleware only sees the cursor of a page request, so the cost is
+    taken from the query here, like the middleware estimates it for
+    /recommend: one unit per distinct criterion.
+    """
+    cost = max(len(query), 1)
+    if admission_controller.enabled and not await admission_controller.acquire(cost):
+        logger.warning(f"Shedding page request (cost {cost})")
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry later",
+            headers={"Retry-After": str(admission_controller.retry_after)},
+        )
+    try:
+        return await _rank_and_store(cursor, handle, query, RANKING_DEPTH)
+    finally:
+        if admission_controller.enabled:
+            admission_controller.release(cost)
+
+async def _rank_and_store(
+    cursor: str,
+    handle: ModelHandle,
+    query: RankingQuery,
+    depth: int,
+    plan: Optional[QueryPlan] = None,
+) -> StoredRanking:
+    """
+    Rank ``depth`` recipes deep and store the ranking behind the cursor.
+
+    Scoring runs in a worker thread so cheap endpoints aren't blocked. The
+    query is only kept with rankings that can still be ranked deeper.
+    """
+    depth = min(depth, RANKING_DEPTH)
+    recipe_ids, scores = await run_in_threadpool(
+        rank_recipes, limit=depth, handle=handle, plan=plan, **query.arguments(handle.labels)
+    )
+    # Fewer results than asked for means there is nothing deeper to rank
+    complete = depth >= RANKING_DEPTH or len(recipe_ids) < depth
+    return ranking_store.put(cursor, handle.version, recipe_ids, scores, None if complete else query, complete)
+
 @router.post("", response_model=List[str])
-async def recommend_recipes(request: RecommendationRequest):
+async def recommend_recipes(
+    request: RecommendationRequest,
+    response: Response,
+    explain: bool = Query(False, description="Return the query plan in the X-Query-Plan header"),
+):
     """
     Get recipe recommendations based on user preferences.
     
-    Returns a list of recipe IDs matching the criteria.
+    Returns a list of recipe IDs matching the criteria. The model version
+    that produced them is returned in the X-Model-Version header, and a
+    cursor for browsing deeper into the ranking via /recommend/page in the
+    X-Result-Cursor header. With ``explain``, the X-Query-Plan header holds
+    the criteria as scored after duplicates were merged, as JSON.
     """
     try:
         logger.info(f"Received recommendation request with {len(request.diet_types)} diet types, "
@@ -42,24 +153,55 @@ async def recommend_recipes(request: RecommendationRequest):
                 detail="At least one search criterion must be provided"
             )
         
-        # Map user input to criteria
-        criteria = map_user_input_to_criteria(
-            cooking_method=request.cooking_method,
-            diet_types=request.diet_types,
-            meal_type=request.meal_type,
-            health_types=request.health_types,
-            cuisine_region=request.cuisine_region,
-            ingredients=request.ingredients,
-            weights=request.weights,
-        )
+        # Pin one model version for the whole request
+        handle = model_manager.get_handle()
+        version = handle.version
+        response.headers["X-Model-Version"] = version
         
-        # Get matching recipes
-        recipe_ids = get_matching_recipes(
-            criteria=criteria, 
-            top_k=request.top_k, 
-            flexible=request.flexible
-        )
+        # Map user input to criteria, rejecting unknown values before any scoring;
+        # suggesting alternatives for unknown values scans the vocabulary
+        try:
+            criteria, exclusions, ranges = await run_in_threadpool(_map_request, request, handle)
+        except UnknownCriteriaError as e:
+            logger.warning(str(e))
+            raise HTTPException(status_code=422, detail=str(e))
+        
+        # Fold repeated criteria so they cost and cache like distinct ones
+        plan = plan_query(criteria, handle)
+        criteria = plan.criteria
+        if explain:
+            # Bounded so that large requests don't exceed proxy header limits
+            explained = plan.explain(max_criteria=EXPLAIN_MAX_CRITERIA)
+            response.headers["X-Query-Plan"] = json.dumps(explained, separators=(",", ":"))
+        
+        # The cursor identifies the deep ranking, independent of top_k
+        cursor = canonical_request_key(criteria, RANKING_DEPTH, request.flexible, version, exclusions, ranges)
+        
+        # Serve identical requests from the response cache; the cursor stays
+        # pageable through the query shared next to the response
+        cache_key = canonical_request_key(criteria, request.top_k, request.flexible, version, exclusions, ranges)
+        cached = response_cache.get(cache_key, version)
+        if cached is not None:
+            if response_cache.get(_query_key(cursor), version) is None:
+                query = RankingQuery.from_criteria(handle.labels, criteria, request.flexible, exclusions, ranges)
+                _share_query(cursor, version, query)
+            logger.info(f"Returning {len(cached)} cached recommendations")
+            response.headers["X-Result-Cursor"] = cursor
+            return cached
+        
+        ranking = ranking_store.get(cursor)
+        if ranking is None or (len(ranking) < request.top_k and not ranking.complete):
+            # Rank a few pages deep; the cursor is ranked deeper only when paged
+            query = RankingQuery.from_criteria(handle.labels, criteria, request.flexible, exclusions, ranges)
+            _share_query(cursor, version, query)
+            ranking = await _rank_and_store(
+                cursor, handle, query, request.top_k * RANKING_INITIAL_DEPTH_FACTOR, plan
+            )
+        # Same criteria with a different top_k: slice the stored ranking
+        recipe_ids, _ = ranking.page(0, request.top_k)
         
+        response.headers["X-Result-Cursor"] = cursor
+        response_cache.set(cache_key, version, recipe_ids)
         logger.info(f"Returning {len(recipe_ids)} recommendations")
         
         # Log memory usage at end of request
@@ -79,4 +221,45 @@ async def recommend_recipes(request: RecommendationRequest):
         raise HTTPException(
             status_code=500,
             detail=f"Error generating recommendations: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get("/page", response_model=RecommendationPage)
+async def get_recommendation_page(
+    response: Response,
+    cursor: str = Query(..., description="Cursor returned in the X-Result-Cursor header"),
+    offset: int = Query(0, ge=0, description="Position of the first result"),
+    limit: int = Query(20, ge=1, le=100, description="Number of results"),
+):
+    """
+    Get a page of a previously computed recommendation ranking.
+    
+    The first page request of a cursor in a worker process ranks it to the
+    full depth, later pages are sliced from the stored ranking without
+    re-scoring. Cursors are valid in every worker for as long as the
+    recommendation response they came with is cached. Expired or unknown
+    cursors, and cursors of a model version that is no longer served,
+    return 404; re-issue the recommendation request then.
+    """
+    ranking = ranking_store.get(cursor)
+    if ranking is None or not ranking.complete:
+        handle = model_manager.get_handle()
+        query = _cursor_query(cursor, handle, ranking)
+        ranking = None if query is None else await _rank_admitted(cursor, handle, query)
+    if ranking is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Cursor expired or unknown, please repeat the recommendation request"
+        )
+    
+    recipe_ids, scores = ranking.page(offset, limit)
+    next_offset = offset + limit if offset + limit < len(ranking) else None
+    response.headers["X-Model-Version"] = ranking.version
+    return RecommendationPage(
+        cursor=cursor,
+        model_version=ranking.version,
+        offset=offset,
+        total=len(ranking),
+        recipe_ids=recipe_ids,
+        scores=scores,
+        next_offset=next_offset,
+    )
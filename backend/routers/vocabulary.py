@@ -0,0 +1,56 @@
+from fastapi import APIRouter, HTTPException, Path, Request, Response
+from typing import Dict, List
+import logging
+
+from core.model_manager import model_manager
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/vocabulary",
+    tags=["vocabulary"]
+)
+
+# Vocabularies only change with the model version, so clients may cache them
+CACHE_CONTROL = "public, max-age=3600"
+
+def _not_modified(request: Request, response: Response, version: str) -> bool:
+    """Set caching headers and tell whether the client's copy is still current."""
+    etag = f'"{version}"'
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return request.headers.get("if-none-match") == etag
+
+@router.get("", response_model=Dict[str, List[str]])
+async def get_vocabulary(request: Request, response: Response):
+    """
+    Get all values accepted in recommendation requests, per attribute type.
+    """
+    handle = model_manager.get_handle()
+    if _not_modified(request, response, handle.version):
+        return Response(status_code=304, headers=dict(response.headers))
+    
+    vocabulary = handle.vocabulary
+    return {attribute_type: vocabulary.values(attribute_type) for attribute_type in vocabulary.attribute_types()}
+
+@router.get("/{attribute_type}", response_model=List[str])
+async def get_attribute_vocabulary(
+    request: Request,
+    response: Response,
+    attribute_type: str = Path(..., description="Attribute type, e.g. ingredient or diet_type"),
+):
+    """
+    Get the values accepted for one attribute type.
+    """
+    handle = model_manager.get_handle()
+    vocabulary = handle.vocabulary
+    if attribute_type not in vocabulary.attribute_types():
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown attribute type '{attribute_type}', expected one of {vocabulary.attribute_types()}"
+        )
+    if _not_modified(request, response, handle.version):
+        return Response(status_code=304, headers=dict(response.headers))
+    
+    return vocabulary.values(attribute_type)
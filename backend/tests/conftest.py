@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+# Tests import the app modules the way main.py does, relative to backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+NUM_RECIPES = 60
+INGREDIENTS = ["basil", "butter", "chicken", "egg", "flour", "garlic", "lemon", "onion", "rice", "tomato"]
+DIET_TYPES = ["vegan", "vegetarian", "high protein"]
+CUISINE_REGIONS = ["asian", "european", "latin american", "middle eastern"]
+COOKING_METHODS = ["bake", "boil", "fry", "grill"]
+
+@pytest.fixture(scope="session")
+def fixture_model():
+    """
+    Small untrained TransE model over a synthetic recipe graph.
+
+    Criteria are (tail, relation, weight) triples as produced by
+    map_user_input_to_criteria. Saffron is on two recipes only, so the
+    attribute index keeps it as positions rather than a bitmask.
+    """
+    from pykeen.models import TransE
+    from pykeen.triples import TriplesFactory
+
+    from core.quantization import recipe_entity_ids
+    from core.serving_artifact import LabelIndex
+
+    rng = np.random.default_rng(0)
+    triples = []
+    for i in range(1, NUM_RECIPES + 1):
+        recipe = f"recipe_{i}"
+        triples += [(recipe, "containsIngredient", f"ingredient_{v}") for v in rng.choice(INGREDIENTS, 3, replace=False)]
+        triples.append((recipe, "hasDietType", f"diet_type_{rng.choice(DIET_TYPES)}"))
+        triples.append((recipe, "hasCuisineRegion", f"cuisine_region_{rng.choice(CUISINE_REGIONS)}"))
+        triples.append((recipe, "usesCookingMethod", f"cooking_method_{rng.choice(COOKING_METHODS)}"))
+    triples += [
+        ("recipe_7", "containsIngredient", "ingredient_saffron"),
+        ("recipe_42", "containsIngredient", "ingredient_saffron"),
+    ]
+
+    triples_factory = TriplesFactory.from_labeled_triples(np.array(triples, dtype=str))
+    model = TransE(triples_factory=triples_factory, embedding_dim=16, random_seed=0).eval()
+    labels = LabelIndex.from_triples_factory(triples_factory)
+    return SimpleNamespace(
+        triples_factory=triples_factory,
+        model=model,
+        labels=labels,
+        recipe_ids=recipe_entity_ids(labels),
+        criteria=[
+            ("ingredient_garlic", "containsIngredient", 1.0),
+            ("diet_type_vegan", "hasDietType", 1.0),
+            ("cuisine_region_asian", "hasCuisineRegion", 0.5),
+            ("cooking_method_grill", "usesCookingMethod", 0.25),
+        ],
+    )
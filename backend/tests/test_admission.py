@@ -0,0 +1,47 @@
+import asyncio
+
+from core.admission import AdmissionController, estimate_cost
+
+def test_queued_request_is_admitted_when_capacity_frees():
+    async def scenario():
+        controller = AdmissionController(max_inflight_cost=2, max_queued_cost=4, queue_timeout=5)
+        assert await controller.acquire(2)
+        waiter = asyncio.create_task(controller.acquire(1))
+        await asyncio.sleep(0)
+        assert controller.queued_cost == 1
+        controller.release(2)
+        assert await waiter
+        assert (controller.inflight_cost, controller.queued_cost) == (1, 0)
+
+    asyncio.run(scenario())
+
+def test_full_queue_is_shed():
+    async def scenario():
+        controller = AdmissionController(max_inflight_cost=1, max_queued_cost=0, queue_timeout=5)
+        assert await controller.acquire(1)
+        assert not await controller.acquire(1)
+        assert controller.shed == 1
+
+    asyncio.run(scenario())
+
+def test_grant_racing_timeout_gives_capacity_back(monkeypatch):
+    controller = AdmissionController(max_inflight_cost=1, max_queued_cost=1, queue_timeout=5)
+
+    async def grant_then_time_out(future, timeout):
+        # The holder releases, _wake grants the waiter, and the timeout fires anyway
+        controller.release(1)
+        assert future.done() and not future.cancelled()
+        raise asyncio.TimeoutError
+
+    async def scenario():
+        assert await controller.acquire(1)
+        monkeypatch.setattr(asyncio, "wait_for", grant_then_time_out)
+        assert not await controller.acquire(1)
+
+    asyncio.run(scenario())
+    assert (controller.inflight_cost, controller.queued_cost, controller.shed) == (0, 0, 1)
+
+def test_cost_counts_distinct_criteria():
+    body = b'{"ingredients": ["tomato", " Tomato", "basil"], "meal_type": ["dinner, lunch", "Dinner"]}'
+    assert estimate_cost(body) == 4
+    assert estimate_cost(b"not json") == 1
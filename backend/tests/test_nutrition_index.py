@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.nutrition_index import NutritionIndex
+from core.recipe_store import RecipeStore
+from core.recommender import map_user_input_to_ranges
+from core.vocabulary import UnknownCriteriaError
+from models.schemas import NutritionRange
+
+@pytest.fixture(scope="module")
+def index(fixture_model):
+    m = fixture_model
+    ids = np.arange(1, 61)
+    recipes = pd.DataFrame({
+        "RecipeId": ids,
+        # Every fifth recipe has no calories
+        "Calories": np.where(ids % 5 == 0, np.nan, ids * 10.0),
+        "SodiumContent": ids % 7 * 100.0,
+    })
+    return NutritionIndex(RecipeStore(recipes), m.labels, m.recipe_ids)
+
+def _recipes(m, index, ranges):
+    """RecipeIds of the candidates, in id order."""
+    labels = m.labels.entity_id_to_label
+    positions = np.flatnonzero(index.candidates(ranges))
+    return sorted(int(labels[i].split("recipe_", 1)[1]) for i in m.recipe_ids[positions].tolist())
+
+def test_candidates_are_inclusive_and_skip_missing_values(fixture_model, index):
+    assert _recipes(fixture_model, index, [("Calories", 100, 140)]) == [11, 12, 13, 14]
+    assert _recipes(fixture_model, index, [("Calories", None, 45)]) == [1, 2, 3, 4]
+    assert len(_recipes(fixture_model, index, [("Calories", 0, None)])) == 48
+    assert index.candidates([]) is None
+
+def test_candidates_intersect_columns(fixture_model, index):
+    expected = [i for i in range(1, 61) if i % 5 and i >= 30 and i % 7 * 100 <= 200]
+    assert _recipes(fixture_model, index, [("Calories", 300, None), ("SodiumContent", None, 200)]) == expected
+
+def test_ranges_match_columns_case_insensitively_and_merge_bounds(index):
+    nutrition = {
+        "calories": NutritionRange(max=600),
+        " Calories": NutritionRange(min=300, max=800),
+        "CALORIES": NutritionRange(min=200),
+        "SodiumContent": NutritionRange(),
+    }
+    assert map_user_input_to_ranges(nutrition, index) == [("Calories", 300, 600)]
+
+def test_ranges_are_sorted_by_column(index):
+    nutrition = {"SodiumContent": NutritionRange(max=500), "Calories": NutritionRange(min=100)}
+    assert map_user_input_to_ranges(nutrition, index) == [("Calories", 100, None), ("SodiumContent", None, 500)]
+
+def test_unknown_column_is_rejected(index):
+    with pytest.raises(UnknownCriteriaError) as e:
+        map_user_input_to_ranges({"Calory": NutritionRange(max=500)}, index)
+    assert e.value.suggestions == {"Calory": ["Calories"]}
+
+def test_non_numeric_column_is_skipped(fixture_model):
+    m = fixture_model
+    recipes = pd.DataFrame({
+        "RecipeId": [1, 2, 3],
+        "Calories": ["100", "unknown", "300"],
+        "SodiumContent": [1.0, 2.0, 3.0],
+    })
+    index = NutritionIndex(RecipeStore(recipes), m.labels, m.recipe_ids)
+    assert index.columns == ["SodiumContent"]
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+import torch
+
+from core.quantization import QuantizedTable, ReducedPrecisionModel
+from core.recommender import _rank_recipes_generic
+
+K = 10
+
+@pytest.mark.parametrize("precision, atol", [("float16", 1e-2), ("int8", 5e-2)])
+def test_table_round_trip(fixture_model, precision, atol):
+    weights = fixture_model.model.entity_representations[0](indices=None).detach()
+    table = QuantizedTable(weights, precision)
+    assert torch.allclose(table.dequantize(), weights, atol=atol)
+    assert torch.equal(table.gather(torch.as_tensor([3, 1])), table.dequantize()[[3, 1]])
+
+def test_float32_matches_predict_target(fixture_model):
+    m = fixture_model
+    expected = _rank_recipes_generic(m.model, m.labels, m.recipe_ids, m.criteria, K, False)
+    reduced = ReducedPrecisionModel(m.model, "float32", chunk_size=7)
+    ids, scores = _rank_recipes_generic(reduced, m.labels, m.recipe_ids, m.criteria, K, False)
+    assert ids == expected[0]
+    np.testing.assert_allclose(scores, expected[1], atol=1e-5)
+
+@pytest.mark.parametrize("precision, atol", [("float16", 1e-2), ("int8", 5e-2)])
+def test_reduced_precision_top_k_is_close(fixture_model, precision, atol):
+    m = fixture_model
+    expected_ids, expected_scores = _rank_recipes_generic(m.model, m.labels, m.recipe_ids, m.criteria, K, False)
+    reduced = ReducedPrecisionModel(m.model, precision)
+    ids, scores = _rank_recipes_generic(reduced, m.labels, m.recipe_ids, m.criteria, K, False)
+    # Near-ties may swap, but the k-th best score can only move by the rounding error
+    np.testing.assert_allclose(scores, expected_scores, atol=atol)
+    assert len(set(ids) & set(expected_ids)) >= K - 2
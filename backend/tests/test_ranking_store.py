@@ -0,0 +1,35 @@
+import numpy as np
+
+from core.ranking_store import RankingQuery, RankingStore, StoredRanking
+
+def _query(m, ranges=None):
+    exclusions = [(m.criteria[0][0], "containsIngredient"), ("ingredient_truffle", "containsIngredient")]
+    return RankingQuery.from_criteria(m.labels, m.criteria, True, exclusions, ranges)
+
+def test_query_round_trips_through_ids(fixture_model):
+    m = fixture_model
+    query = _query(m, [("Calories", None, 600.0)])
+    assert len(query) == len(m.criteria)
+    arguments = query.arguments(m.labels)
+    assert arguments["criteria"] == m.criteria
+    # Unknown attributes can't exclude anything and are dropped
+    assert arguments["exclusions"] == [(m.criteria[0][0], "containsIngredient")]
+    assert arguments["flexible"] is True
+    assert arguments["ranges"] == [("Calories", None, 600.0)]
+
+def test_query_counts_towards_the_budget(fixture_model):
+    query = _query(fixture_model)
+    complete = StoredRanking("v1", ["1", "2"], [1.0, 0.5])
+    partial = StoredRanking("v1", ["1", "2"], [1.0, 0.5], query, complete=False)
+    assert partial.nbytes == complete.nbytes + query.nbytes
+    assert query.nbytes > query.relation_ids.nbytes + query.tail_ids.nbytes + query.weights.nbytes
+
+def test_store_evicts_by_size_including_queries(fixture_model):
+    query = _query(fixture_model)
+    size = StoredRanking("v1", ["1"], [1.0], query, complete=False).nbytes
+    store = RankingStore(max_bytes=3 * size, ttl=60)
+    for i in range(4):
+        store.put(f"cursor{i}", "v1", ["1"], [1.0], query, complete=False)
+    assert "cursor0" not in store
+    assert all(f"cursor{i}" in store for i in range(1, 4))
+    np.testing.assert_array_equal(store.get("cursor3").recipe_ids, [1])
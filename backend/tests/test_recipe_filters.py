@@ -0,0 +1,53 @@
+import numpy as np
+
+from core.recipe_filters import RecipeAttributeIndex, attribute_triples
+from core.recommender import _rank_recipes_compiled, _rank_recipes_generic
+from core.scoring_kernel import CompiledScorer
+
+K = 10
+
+def _recipes_with(m, attributes):
+    """Recipe positions that have any of the (tail, relation) attributes, straight from the triples."""
+    tf = m.triples_factory
+    heads = {tf.entity_to_id[h] for h, r, t in tf.triples if (t, r) in attributes}
+    return np.isin(m.recipe_ids.numpy(), list(heads))
+
+def test_mask_matches_triples(fixture_model):
+    m = fixture_model
+    index = RecipeAttributeIndex(m.labels, attribute_triples(m.triples_factory), m.recipe_ids)
+    # Saffron is stored as positions, the others as bitmasks
+    assert index._positions.keys() == {("containsIngredient", "ingredient_saffron")}
+    for attributes in (
+        [("ingredient_saffron", "containsIngredient")],
+        [("diet_type_vegan", "hasDietType")],
+        [
+            ("Diet_Type_Vegan", "hasDietType"),
+            ("ingredient_saffron", "containsIngredient"),
+            ("cuisine_region_asian", "hasCuisineRegion"),
+        ],
+    ):
+        expected = _recipes_with(m, {(tail.casefold(), relation) for tail, relation in attributes})
+        np.testing.assert_array_equal(index.mask(attributes), expected)
+    assert index.mask([("ingredient_truffle", "containsIngredient")]) is None
+
+def test_excluded_top_k_matches_predict_target(fixture_model):
+    m = fixture_model
+    index = RecipeAttributeIndex(m.labels, attribute_triples(m.triples_factory), m.recipe_ids)
+    excluded = index.mask([("ingredient_garlic", "containsIngredient"), ("ingredient_saffron", "containsIngredient")])
+    assert 0 < excluded.sum() < len(excluded)
+
+    # Reference: the unfiltered generic ranking with the excluded recipes dropped afterwards
+    labels = m.labels.entity_id_to_label
+    dropped = {labels[i].split("recipe_", 1)[1] for i in m.recipe_ids.numpy()[excluded].tolist()}
+    all_ids, all_scores = _rank_recipes_generic(m.model, m.labels, m.recipe_ids, m.criteria, len(m.recipe_ids), False)
+    kept = [(i, s) for i, s in zip(all_ids, all_scores) if i not in dropped][:K]
+    assert dropped & set(all_ids[:K])
+
+    ids, scores = _rank_recipes_generic(m.model, m.labels, m.recipe_ids, m.criteria, K, False, excluded)
+    assert ids == [i for i, _ in kept]
+    np.testing.assert_allclose(scores, [s for _, s in kept], atol=1e-6)
+
+    scorer = CompiledScorer.from_model(m.model, m.recipe_ids)
+    ids, scores = _rank_recipes_compiled(scorer, m.labels, m.criteria, K, excluded)
+    assert ids == [i for i, _ in kept]
+    np.testing.assert_allclose(scores, [s for _, s in kept], atol=1e-5)
@@ -0,0 +1,116 @@
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.admission import AdmissionController
+from core.model_manager import ModelHandle
+from core.nutrition_index import NutritionIndex
+from core.ranking_store import RankingStore
+from core.recipe_filters import RecipeAttributeIndex, attribute_triples
+from core.recipe_store import RecipeStore
+from core.response_cache import ResponseCache
+from core.scoring_kernel import CompiledScorer
+from core.vocabulary import VocabularyIndex
+from routers import recommend
+
+REQUEST = {"ingredients": ["garlic"], "diet_types": ["vegan"], "top_k": 3}
+
+@pytest.fixture(scope="module")
+def handle(fixture_model):
+    m = fixture_model
+    recipes = pd.DataFrame({"RecipeId": range(1, 61), "Calories": [float(10 * i) for i in range(1, 61)]})
+    return ModelHandle(
+        "v1",
+        m.model,
+        m.labels,
+        CompiledScorer.from_model(m.model, m.recipe_ids),
+        RecipeAttributeIndex(m.labels, attribute_triples(m.triples_factory), m.recipe_ids),
+        VocabularyIndex(m.labels),
+        nutrition=NutritionIndex(RecipeStore(recipes), m.labels, m.recipe_ids),
+    )
+
+@pytest.fixture
+def worker(handle, monkeypatch, tmp_path):
+    """Start a worker process sharing the response cache directory; call again for another one."""
+    monkeypatch.setattr(recommend.model_manager, "get_handle", lambda: handle)
+    app = FastAPI()
+    app.include_router(recommend.router)
+
+    def start() -> TestClient:
+        monkeypatch.setattr(recommend, "response_cache", ResponseCache(directory=str(tmp_path)))
+        monkeypatch.setattr(recommend, "ranking_store", RankingStore())
+        return TestClient(app)
+
+    return start
+
+def _fail(*args, **kwargs):
+    raise AssertionError("scored again")
+
+def test_cache_hit_of_another_worker_is_served_without_scoring(worker, monkeypatch):
+    first = worker().post("/recommend", json=REQUEST)
+    assert first.status_code == 200
+
+    client = worker()
+    monkeypatch.setattr(recommend, "rank_recipes", _fail)
+    second = client.post("/recommend", json={**REQUEST, "ingredients": [" Garlic"], "diet_types": ["Vegan"]})
+    assert second.json() == first.json()
+    assert second.headers["X-Result-Cursor"] == first.headers["X-Result-Cursor"]
+
+def test_cursor_is_paged_by_another_worker(worker):
+    first = worker().post("/recommend", json=REQUEST)
+    page = worker().get("/recommend/page", params={"cursor": first.headers["X-Result-Cursor"], "limit": 100})
+    assert page.status_code == 200
+    body = page.json()
+    assert body["recipe_ids"][:3] == first.json()
+    assert body["total"] == 60 and body["next_offset"] is None
+
+def test_page_ranks_a_shallow_ranking_deeper_once(worker, monkeypatch):
+    client = worker()
+    first = client.post("/recommend", json=REQUEST)
+    cursor = first.headers["X-Result-Cursor"]
+    assert len(recommend.ranking_store.get(cursor)) == 3 * recommend.RANKING_INITIAL_DEPTH_FACTOR
+
+    page = client.get("/recommend/page", params={"cursor": cursor, "offset": 20, "limit": 10}).json()
+    assert page["total"] == 60 and page["next_offset"] == 30
+    monkeypatch.setattr(recommend, "rank_recipes", _fail)
+    again = client.get("/recommend/page", params={"cursor": cursor, "offset": 20, "limit": 10}).json()
+    assert again == page
+
+def test_unknown_cursor_is_not_found(worker):
+    assert worker().get("/recommend/page", params={"cursor": "0" * 64}).status_code == 404
+
+def test_deep_ranking_of_a_page_is_shed_when_busy(worker, monkeypatch):
+    client = worker()
+    cursor = client.post("/recommend", json=REQUEST).headers["X-Result-Cursor"]
+    controller = AdmissionController(max_inflight_cost=1, max_queued_cost=0, queue_timeout=1, retry_after=7)
+    controller.inflight_cost = 1
+    monkeypatch.setattr(recommend, "admission_controller", controller)
+
+    page = client.get("/recommend/page", params={"cursor": cursor})
+    assert page.status_code == 503 and page.headers["Retry-After"] == "7"
+    assert controller.shed == 1
+
+    controller.release(1)
+    assert client.get("/recommend/page", params={"cursor": cursor}).status_code == 200
+    assert (controller.inflight_cost, controller.admitted) == (0, 1)
+
+def test_nutrition_bounds_spelled_twice_are_merged(worker):
+    client = worker()
+    nutrition = {"Calories": {"min": 300}, "calories": {"max": 400}}
+    response = client.post("/recommend", json={**REQUEST, "top_k": 50, "nutrition": nutrition})
+    assert response.status_code == 200
+    assert sorted(map(int, response.json())) == list(range(30, 41))
+
+def test_unknown_values_get_a_bounded_error(worker, monkeypatch):
+    suggested = []
+    vocabulary = recommend.model_manager.get_handle().vocabulary
+    suggest = vocabulary.suggest
+    monkeypatch.setattr(vocabulary, "suggest", lambda *args: suggested.append(args) or suggest(*args))
+
+    unknown = [f"garlik{i}" for i in range(200)] + ["x" * 1000]
+    response = worker().post("/recommend", json={**REQUEST, "ingredients": unknown})
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert len(suggested) == 5 and "did you mean 'garlic'" in detail
+    assert detail.endswith("and 181 more") and len(detail) < 1000
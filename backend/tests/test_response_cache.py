@@ -0,0 +1,23 @@
+from core.response_cache import ResponseCache, canonical_request_key
+
+def test_versions_interleaving_during_hot_swap_keep_their_entries():
+    cache = ResponseCache(directory=None)
+    old = canonical_request_key([("ingredient_garlic", "containsIngredient", 1.0)], 5, False, "v1")
+    new = canonical_request_key([("ingredient_garlic", "containsIngredient", 1.0)], 5, False, "v2")
+    cache.set(old, "v1", ["1"])
+    cache.set(new, "v2", ["2"])
+    # A request still finishing on v1 must not wipe v2's entries, nor the reverse
+    cache.set(old, "v1", ["1"])
+    assert cache.get(new, "v2") == ["2"]
+    assert cache.get(old, "v1") == ["1"]
+
+def test_entries_are_only_returned_for_their_version():
+    cache = ResponseCache(directory=None)
+    cache.set("key", "v1", ["1"])
+    assert cache.get("key", "v2") is None
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    ResponseCache(directory=str(tmp_path)).set("key", "v1", ["1"])
+    other = ResponseCache(directory=str(tmp_path))
+    assert other.get("key", "v1") == ["1"]
+    assert other.get("key", "v2") is None
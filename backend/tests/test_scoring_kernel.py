@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from core.quantization import ReducedPrecisionModel
+from core.recommender import _rank_recipes_compiled, _rank_recipes_generic
+from core.scoring_kernel import CompiledScorer
+
+K = 10
+
+def test_compiled_matches_predict_target(fixture_model):
+    m = fixture_model
+    expected_ids, expected_scores = _rank_recipes_generic(m.model, m.labels, m.recipe_ids, m.criteria, K, False)
+    scorer = CompiledScorer.from_model(m.model, m.recipe_ids)
+    ids, scores = _rank_recipes_compiled(scorer, m.labels, m.criteria, K)
+    assert ids == expected_ids
+    np.testing.assert_allclose(scores, expected_scores, atol=1e-5)
+
+def test_compiled_scores_all_recipes(fixture_model):
+    m = fixture_model
+    scorer = CompiledScorer.from_model(m.model, m.recipe_ids)
+    ids, scores = _rank_recipes_compiled(scorer, m.labels, m.criteria, len(m.recipe_ids))
+    expected_ids, expected_scores = _rank_recipes_generic(
+        m.model, m.labels, m.recipe_ids, m.criteria, len(m.recipe_ids), False
+    )
+    assert ids == expected_ids
+    np.testing.assert_allclose(scores, expected_scores, atol=1e-5)
+
+@pytest.mark.parametrize("precision", ["float16", "int8"])
+def test_compiled_matches_reduced_precision_model(fixture_model, precision):
+    m = fixture_model
+    reduced = ReducedPrecisionModel(m.model, precision)
+    expected_ids, expected_scores = _rank_recipes_generic(reduced, m.labels, m.recipe_ids, m.criteria, K, False)
+    scorer = CompiledScorer(reduced, m.recipe_ids, chunk_size=7)
+    ids, scores = _rank_recipes_compiled(scorer, m.labels, m.criteria, K)
+    assert ids == expected_ids
+    np.testing.assert_allclose(scores, expected_scores, atol=1e-5)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from core.recipe_filters import RecipeAttributeIndex, attribute_triples
+from core.recommender import _rank_recipes_compiled, _rank_recipes_generic
+from core.scoring_kernel import CompiledScorer
+from core.sharded_scoring import ShardedScorer
+
+K = 10
+
+@pytest.fixture(scope="module")
+def sharded(fixture_model):
+    m = fixture_model
+    # Copy the tables so moving them to shared memory leaves the fixture model alone
+    scorer = CompiledScorer.from_model(m.model, m.recipe_ids.clone())
+    scorer.entities.data = scorer.entities.data.clone()
+    scorer.relations.data = scorer.relations.data.clone()
+    sharded = ShardedScorer(scorer, 3)
+    yield sharded
+    sharded.close()
+
+def test_sharded_matches_predict_target(fixture_model, sharded):
+    m = fixture_model
+    expected_ids, expected_scores = _rank_recipes_generic(m.model, m.labels, m.recipe_ids, m.criteria, K, False)
+    ids, scores = _rank_recipes_compiled(sharded, m.labels, m.criteria, K)
+    assert sharded.num_workers == 3
+    assert ids == expected_ids
+    np.testing.assert_allclose(scores, expected_scores, atol=1e-5)
+
+def test_sharded_excluded_matches_predict_target(fixture_model, sharded):
+    m = fixture_model
+    index = RecipeAttributeIndex(m.labels, attribute_triples(m.triples_factory), m.recipe_ids)
+    excluded = index.mask([("diet_type_vegan", "hasDietType"), ("ingredient_saffron", "containsIngredient")])
+    expected_ids, expected_scores = _rank_recipes_generic(
+        m.model, m.labels, m.recipe_ids, m.criteria, K, False, excluded
+    )
+    ids, scores = _rank_recipes_compiled(sharded, m.labels, m.criteria, K, excluded)
+    assert ids == expected_ids
+    np.testing.assert_allclose(scores, expected_scores, atol=1e-5)
+
+def test_sharded_returns_all_recipes_when_k_exceeds_shards(fixture_model, sharded):
+    m = fixture_model
+    ids, _ = _rank_recipes_compiled(sharded, m.labels, m.criteria, len(m.recipe_ids))
+    expected_ids, _ = _rank_recipes_generic(m.model, m.labels, m.recipe_ids, m.criteria, len(m.recipe_ids), False)
+    assert ids == expected_ids